@@ -0,0 +1,59 @@
+"""Partial covering indexes for catalog pages
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2025-09-02 10:30:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '0002'
+down_revision = '0001'
+branch_labels = None
+depends_on = None
+
+CATALOG_PREDICATE = "moderation_status = 'approved' AND NOT is_hidden"
+
+
+def upgrade() -> None:
+    # CONCURRENTLY cannot run inside a transaction block
+    with op.get_context().autocommit_block():
+        # Unfiltered category pages: equality on (city_id, category), then sort order
+        op.create_index(
+            'idx_listings_catalog',
+            'listings',
+            [
+                'city_id',
+                'category',
+                sa.text('priority_level DESC'),
+                sa.text('created_at DESC'),
+                sa.text('id DESC'),
+            ],
+            unique=False,
+            postgresql_where=sa.text(CATALOG_PREDICATE),
+            postgresql_concurrently=True,
+        )
+        # Restaurant pages filtered by sub_slug
+        op.create_index(
+            'idx_listings_catalog_sub',
+            'listings',
+            [
+                'city_id',
+                'category',
+                'sub_slug',
+                sa.text('priority_level DESC'),
+                sa.text('created_at DESC'),
+                sa.text('id DESC'),
+            ],
+            unique=False,
+            postgresql_where=sa.text(CATALOG_PREDICATE),
+            postgresql_concurrently=True,
+        )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.drop_index('idx_listings_catalog_sub', table_name='listings', postgresql_concurrently=True)
+        op.drop_index('idx_listings_catalog', table_name='listings', postgresql_concurrently=True)
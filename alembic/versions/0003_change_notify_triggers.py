@@ -0,0 +1,101 @@
+"""NOTIFY triggers for listings, cities and system_settings changes
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2025-09-10 09:00:00.000000
+
+"""
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = '0003'
+down_revision = '0002'
+branch_labels = None
+depends_on = None
+
+# Channel read by app.core.db_listener
+CHANGE_CHANNEL = 'karma_changes'
+
+# Payloads carry only keys (NOTIFY payloads are limited to 8000 bytes);
+# tx makes every change unique so listeners can deduplicate work across processes
+LISTINGS_FUNCTION = f"""
+CREATE OR REPLACE FUNCTION notify_listings_change() RETURNS trigger AS $$
+DECLARE
+    row_data listings;
+BEGIN
+    IF TG_OP = 'DELETE' THEN
+        row_data := OLD;
+    ELSE
+        row_data := NEW;
+    END IF;
+    PERFORM pg_notify('{CHANGE_CHANNEL}', json_build_object(
+        'table', TG_TABLE_NAME,
+        'op', TG_OP,
+        'tx', txid_current(),
+        'id', row_data.id,
+        'city_id', row_data.city_id,
+        'category', row_data.category,
+        'old_city_id', CASE WHEN TG_OP = 'UPDATE' THEN OLD.city_id END,
+        'old_category', CASE WHEN TG_OP = 'UPDATE' THEN OLD.category END
+    )::text);
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+"""
+
+CITIES_FUNCTION = f"""
+CREATE OR REPLACE FUNCTION notify_cities_change() RETURNS trigger AS $$
+BEGIN
+    PERFORM pg_notify('{CHANGE_CHANNEL}', json_build_object(
+        'table', TG_TABLE_NAME,
+        'op', TG_OP,
+        'tx', txid_current(),
+        'id', CASE WHEN TG_OP = 'DELETE' THEN OLD.id ELSE NEW.id END
+    )::text);
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+"""
+
+SETTINGS_FUNCTION = f"""
+CREATE OR REPLACE FUNCTION notify_system_settings_change() RETURNS trigger AS $$
+BEGIN
+    PERFORM pg_notify('{CHANGE_CHANNEL}', json_build_object(
+        'table', TG_TABLE_NAME,
+        'op', TG_OP,
+        'tx', txid_current(),
+        'key', CASE WHEN TG_OP = 'DELETE' THEN OLD.key ELSE NEW.key END
+    )::text);
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+"""
+
+TABLES = ('listings', 'cities', 'system_settings')
+
+
+def upgrade() -> None:
+    op.execute(LISTINGS_FUNCTION)
+    op.execute(CITIES_FUNCTION)
+    op.execute(SETTINGS_FUNCTION)
+    
+    for table in TABLES:
+        # Updates that leave every column unchanged stay silent
+        op.execute(f"""
+            CREATE TRIGGER {table}_notify_write
+            AFTER INSERT OR DELETE ON {table}
+            FOR EACH ROW EXECUTE FUNCTION notify_{table}_change()
+        """)
+        op.execute(f"""
+            CREATE TRIGGER {table}_notify_update
+            AFTER UPDATE ON {table}
+            FOR EACH ROW WHEN (OLD.* IS DISTINCT FROM NEW.*)
+            EXECUTE FUNCTION notify_{table}_change()
+        """)
+
+
+def downgrade() -> None:
+    for table in TABLES:
+        op.execute(f"DROP TRIGGER IF EXISTS {table}_notify_update ON {table}")
+        op.execute(f"DROP TRIGGER IF EXISTS {table}_notify_write ON {table}")
+        op.execute(f"DROP FUNCTION IF EXISTS notify_{table}_change()")
@@ -0,0 +1,96 @@
+"""Full-text and trigram search on listings
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2025-09-16 11:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision = '0004'
+down_revision = '0003'
+branch_labels = None
+depends_on = None
+
+CATALOG_PREDICATE = "moderation_status = 'approved' AND NOT is_hidden"
+
+
+def search_vector_sql(row: str) -> str:
+    """
+    tsvector of a listings row. Listings are written in several languages, so
+    name and description are indexed unstemmed ('simple') plus with Russian
+    and English stemming; address and district only unstemmed.
+    Weights: name A, district B, address C, description D.
+    Keep in sync with CatalogService.build_search_query (SEARCH_CONFIGS).
+    """
+    return f"""
+        setweight(to_tsvector('simple', coalesce({row}.name, '')), 'A') ||
+        setweight(to_tsvector('russian', coalesce({row}.name, '')), 'A') ||
+        setweight(to_tsvector('english', coalesce({row}.name, '')), 'A') ||
+        setweight(to_tsvector('simple', coalesce({row}.district, '')), 'B') ||
+        setweight(to_tsvector('simple', coalesce({row}.address, '')), 'C') ||
+        setweight(to_tsvector('simple', coalesce({row}.description, '')), 'D') ||
+        setweight(to_tsvector('russian', coalesce({row}.description, '')), 'D') ||
+        setweight(to_tsvector('english', coalesce({row}.description, '')), 'D')
+    """
+
+
+def upgrade() -> None:
+    op.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    
+    op.add_column('listings', sa.Column('search_vector', postgresql.TSVECTOR(), nullable=True))
+    
+    op.execute(f"""
+        CREATE OR REPLACE FUNCTION listings_search_vector_update() RETURNS trigger AS $$
+        BEGIN
+            NEW.search_vector := {search_vector_sql('NEW')};
+            RETURN NEW;
+        END;
+        $$ LANGUAGE plpgsql;
+    """)
+    op.execute("""
+        CREATE TRIGGER listings_search_vector
+        BEFORE INSERT OR UPDATE OF name, description, address, district ON listings
+        FOR EACH ROW EXECUTE FUNCTION listings_search_vector_update()
+    """)
+    
+    # Backfill without a change notification per row (migration 0003)
+    op.execute("ALTER TABLE listings DISABLE TRIGGER listings_notify_update")
+    op.execute(f"UPDATE listings SET search_vector = {search_vector_sql('listings')}")
+    op.execute("ALTER TABLE listings ENABLE TRIGGER listings_notify_update")
+    
+    # CONCURRENTLY cannot run inside a transaction block
+    with op.get_context().autocommit_block():
+        op.create_index(
+            'idx_listings_search',
+            'listings',
+            ['search_vector'],
+            unique=False,
+            postgresql_using='gin',
+            postgresql_where=sa.text(CATALOG_PREDICATE),
+            postgresql_concurrently=True,
+        )
+        # Fuzzy name matching (similarity / % operator)
+        op.create_index(
+            'idx_listings_name_trgm',
+            'listings',
+            ['name'],
+            unique=False,
+            postgresql_using='gin',
+            postgresql_ops={'name': 'gin_trgm_ops'},
+            postgresql_where=sa.text(CATALOG_PREDICATE),
+            postgresql_concurrently=True,
+        )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.drop_index('idx_listings_name_trgm', table_name='listings', postgresql_concurrently=True)
+        op.drop_index('idx_listings_search', table_name='listings', postgresql_concurrently=True)
+    
+    op.execute("DROP TRIGGER IF EXISTS listings_search_vector ON listings")
+    op.execute("DROP FUNCTION IF EXISTS listings_search_vector_update()")
+    op.drop_column('listings', 'search_vector')
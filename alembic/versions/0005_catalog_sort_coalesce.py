@@ -0,0 +1,67 @@
+"""Catalog indexes on NULL-safe sort expressions
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2025-09-22 10:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '0005'
+down_revision = '0004'
+branch_labels = None
+depends_on = None
+
+CATALOG_PREDICATE = "moderation_status = 'approved' AND NOT is_hidden"
+
+# Same expressions as catalog_service.SORT_PRIORITY / SORT_CREATED_AT
+SORT_COLUMNS = [
+    sa.text('COALESCE(priority_level, 0) DESC'),
+    sa.text("COALESCE(created_at, '1970-01-01 00:00:00'::timestamp) DESC"),
+    sa.text('id DESC'),
+]
+PLAIN_SORT_COLUMNS = [
+    sa.text('priority_level DESC'),
+    sa.text('created_at DESC'),
+    sa.text('id DESC'),
+]
+
+
+def _create_catalog_indexes(sort_columns) -> None:
+    op.create_index(
+        'idx_listings_catalog',
+        'listings',
+        ['city_id', 'category', *sort_columns],
+        unique=False,
+        postgresql_where=sa.text(CATALOG_PREDICATE),
+        postgresql_concurrently=True,
+    )
+    op.create_index(
+        'idx_listings_catalog_sub',
+        'listings',
+        ['city_id', 'category', 'sub_slug', *sort_columns],
+        unique=False,
+        postgresql_where=sa.text(CATALOG_PREDICATE),
+        postgresql_concurrently=True,
+    )
+
+
+def _drop_catalog_indexes() -> None:
+    op.drop_index('idx_listings_catalog_sub', table_name='listings', postgresql_concurrently=True)
+    op.drop_index('idx_listings_catalog', table_name='listings', postgresql_concurrently=True)
+
+
+def upgrade() -> None:
+    # Catalog queries order by COALESCE(...) so NULL sort values match their cursors;
+    # the plain column indexes from 0002 no longer serve them
+    with op.get_context().autocommit_block():
+        _drop_catalog_indexes()
+        _create_catalog_indexes(SORT_COLUMNS)
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        _drop_catalog_indexes()
+        _create_catalog_indexes(PLAIN_SORT_COLUMNS)
@@ -1,16 +1,38 @@
 """
 FastAPI application for Karma System API.
 """
-from fastapi import FastAPI
+from contextlib import asynccontextmanager
+
+from fastapi import FastAPI, Response
 from fastapi.middleware.cors import CORSMiddleware
+from prometheus_client import CONTENT_TYPE_LATEST, generate_latest
 
 from app.api.routes import qr, partners, listings
+from app.core.cache_subscriber import start_invalidation_subscriber, stop_invalidation_subscriber
+from app.core.db_listener import start_change_listener, stop_change_listener
+from app.core.redis_pool import close_redis_pool
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Manage standalone API startup and shutdown."""
+    # Mounted sub-app lifespans do not run, so this only covers `uvicorn app.api.main:app`
+    subscriber_task = start_invalidation_subscriber()
+    listener_task = start_change_listener()
+    
+    yield
+    
+    await stop_invalidation_subscriber(subscriber_task)
+    await stop_change_listener(listener_task)
+    await close_redis_pool()
+
 
 # Create FastAPI app
 app = FastAPI(
     title="Karma System API",
     description="REST API for Karma System",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
 # Add CORS middleware
@@ -36,3 +58,8 @@ async def root():
 async def health():
     """Health check endpoint."""
     return {"status": "healthy"}
+
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    """Prometheus metrics (cache hit/miss/error counters, payload sizes, Redis latency)."""
+    return Response(generate_latest(), media_type=CONTENT_TYPE_LATEST)
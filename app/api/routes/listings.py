@@ -1,35 +1,186 @@
 """
 Listings API routes.
 """
-from fastapi import APIRouter, HTTPException, Depends, Query
+import os
+from fastapi import APIRouter, HTTPException, Depends, Query, Request, Response
 from sqlalchemy.ext.asyncio import AsyncSession
 from typing import Optional
 
 from app.db.database import get_db
-from app.core.services.catalog_service import CatalogService
+from app.core.services.catalog_service import catalog_service
 
 router = APIRouter()
 
+# Seconds clients and proxies may reuse a listings response without revalidating
+LISTINGS_CACHE_MAX_AGE = int(os.getenv("LISTINGS_CACHE_MAX_AGE", "60"))
+
+def _etag_matches(request: Request, etag: str) -> bool:
+    """Whether If-None-Match names etag (weak comparison, as for GET)."""
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    opaque = etag[2:] if etag.startswith("W/") else etag
+    return any(
+        (tag[2:] if tag.startswith("W/") else tag) == opaque
+        for tag in (part.strip() for part in header.split(","))
+    )
+
+def _cache_headers(etag: Optional[str]) -> dict:
+    """Validator and freshness headers for a cacheable listings response."""
+    headers = {"Cache-Control": f"public, max-age={LISTINGS_CACHE_MAX_AGE}"}
+    if etag:
+        headers["ETag"] = etag
+    return headers
+
+def _not_modified(etag: str) -> Response:
+    """Empty 304 response carrying the same validator and cache headers."""
+    return Response(status_code=304, headers=_cache_headers(etag))
+
+def _catalog_filters(
+    restaurant_sub_slug: Optional[str],
+    district: Optional[str],
+    has_phone: bool,
+    has_location: bool,
+    min_priority: int
+) -> dict:
+    """Collect catalog filters given in the query string."""
+    filters = {}
+    if restaurant_sub_slug:
+        filters["sub_slug"] = restaurant_sub_slug
+    if district:
+        filters["district"] = district
+    if has_phone:
+        filters["has_phone"] = True
+    if has_location:
+        filters["has_location"] = True
+    if min_priority:
+        filters["min_priority"] = min_priority
+    return filters
+
 @router.get("/")
 async def get_listings(
+    request: Request,
+    response: Response,
     city_id: int = Query(..., description="City ID"),
     category: str = Query(..., description="Category slug"),
     page: int = Query(1, ge=1, description="Page number"),
     per_page: int = Query(10, ge=1, le=50, description="Items per page"),
     restaurant_sub_slug: Optional[str] = Query(None, description="Restaurant filter"),
+    district: Optional[str] = Query(None, description="District filter"),
+    has_phone: bool = Query(False, description="Only listings with a phone"),
+    has_location: bool = Query(False, description="Only listings with coordinates"),
+    min_priority: int = Query(0, ge=0, description="Minimum priority level"),
+    cursor: Optional[str] = Query(None, description="Opaque cursor for keyset pagination (empty for first page)"),
+    exact_total: bool = Query(True, description="Compute exact total; false returns only has_more"),
     db: AsyncSession = Depends(get_db)
 ):
-    """Get paginated listings."""
+    """Get paginated listings (conditional GET via ETag / If-None-Match)."""
     try:
-        service = CatalogService()
-        filters = {}
-        if restaurant_sub_slug:
-            filters["restaurant_sub_slug"] = restaurant_sub_slug
-            
-        result = await service.get_listings(
-            db, city_id, category, page, per_page, filters
+        filters = _catalog_filters(restaurant_sub_slug, district, has_phone, has_location, min_priority)
+        
+        # Decided before any page is read: unchanged catalogs cost one generation lookup
+        etag = await catalog_service.catalog_etag(city_id, category, str(sorted(request.query_params.multi_items())))
+        if etag and _etag_matches(request, etag):
+            return _not_modified(etag)
+        response.headers.update(_cache_headers(etag))
+        
+        if cursor is not None:
+            items, total_count, next_cursor, prev_cursor = await catalog_service.get_page_by_cursor(
+                db, city_id, category, cursor, per_page, filters, exact_total
+            )
+            return {
+                "items": items,
+                "total_count": total_count,
+                "has_more": next_cursor is not None,
+                "next_cursor": next_cursor,
+                "prev_cursor": prev_cursor
+            }
+        
+        items, total_count, current_page, total_pages = await catalog_service.get_page(
+            db, city_id, category, page, per_page, filters, exact_total
         )
-        return result
+        return {
+            "items": items,
+            "total_count": total_count,
+            "has_more": current_page < total_pages,
+            "page": current_page,
+            "total_pages": total_pages
+        }
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail="Internal server error")
+
+@router.get("/facets")
+async def get_listing_facets(
+    city_id: int = Query(..., description="City ID"),
+    category: str = Query(..., description="Category slug"),
+    restaurant_sub_slug: Optional[str] = Query(None, description="Restaurant filter"),
+    district: Optional[str] = Query(None, description="District filter"),
+    has_phone: bool = Query(False, description="Only listings with a phone"),
+    has_location: bool = Query(False, description="Only listings with coordinates"),
+    min_priority: int = Query(0, ge=0, description="Minimum priority level"),
+    db: AsyncSession = Depends(get_db)
+):
+    """Get listing counts per filter option for the current filter selection."""
+    try:
+        filters = _catalog_filters(restaurant_sub_slug, district, has_phone, has_location, min_priority)
+        return await catalog_service.get_facets(db, city_id, category, filters)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail="Internal server error")
+
+@router.get("/search")
+async def search_listings(
+    city_id: int = Query(..., description="City ID"),
+    q: str = Query(..., min_length=2, max_length=100, description="Search text"),
+    category: Optional[str] = Query(None, description="Category slug (all categories if omitted)"),
+    limit: int = Query(20, ge=1, le=50, description="Max results"),
+    offset: int = Query(0, ge=0, le=1000, description="Results to skip"),
+    db: AsyncSession = Depends(get_db)
+):
+    """Search listings by name, description, address and district."""
+    try:
+        items, total_count = await catalog_service.search(db, city_id, q, category, limit, offset)
+        return {
+            "items": items,
+            "total_count": total_count,
+            "has_more": offset + len(items) < total_count
+        }
+    except Exception as e:
+        raise HTTPException(status_code=500, detail="Internal server error")
+
+@router.get("/suggest")
+async def suggest_listings(
+    city_id: int = Query(..., description="City ID"),
+    q: str = Query(..., min_length=1, max_length=100, description="Text typed so far"),
+    limit: int = Query(10, ge=1, le=20, description="Max suggestions")
+):
+    """Autocomplete listing names and districts (served from memory)."""
+    try:
+        return {"items": await catalog_service.suggest(city_id, q, limit)}
+    except Exception as e:
+        raise HTTPException(status_code=500, detail="Internal server error")
+
+@router.get("/batch")
+async def get_listings_batch(
+    ids: str = Query(..., description="Comma-separated listing IDs (up to 100)"),
+    db: AsyncSession = Depends(get_db)
+):
+    """Get several listings in one call, in requested order."""
+    try:
+        listing_ids = [int(part) for part in ids.split(",") if part.strip()]
+    except ValueError:
+        raise HTTPException(status_code=400, detail="ids must be comma-separated integers")
+    
+    try:
+        items = await catalog_service.get_listings_by_ids(db, listing_ids)
+        found = {item['id'] for item in items}
+        return {
+            "items": items,
+            "missing": [listing_id for listing_id in dict.fromkeys(listing_ids) if listing_id not in found]
+        }
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
@@ -38,14 +189,20 @@ async def get_listings(
 @router.get("/{listing_id}")
 async def get_listing(
     listing_id: int,
+    request: Request,
+    response: Response,
     db: AsyncSession = Depends(get_db)
 ):
-    """Get single listing by ID."""
+    """Get single listing by ID (conditional GET via ETag / If-None-Match)."""
     try:
-        service = CatalogService()
-        listing = await service.get_listing_by_id(db, listing_id)
+        listing = await catalog_service.get_listing(db, listing_id)
         if not listing:
             raise HTTPException(status_code=404, detail="Listing not found")
+        
+        etag = catalog_service.listing_etag(listing)
+        if _etag_matches(request, etag):
+            return _not_modified(etag)
+        response.headers.update(_cache_headers(etag))
         return listing
     except HTTPException:
         raise
@@ -6,7 +6,7 @@ from .inline import (
     get_language_selection, get_policy_accept, get_categories,
     get_restaurant_filters, get_profile_guest, get_profile_partner,
     get_listing_card, get_pagination, get_cities, get_partner_categories,
-    get_restaurant_subcategories
+    get_restaurant_subcategories, get_catalog_filters, encode_filters, decode_filters
 )
 
 __all__ = [
@@ -14,5 +14,5 @@ __all__ = [
     "get_language_selection", "get_policy_accept", "get_categories",
     "get_restaurant_filters", "get_profile_guest", "get_profile_partner",
     "get_listing_card", "get_pagination", "get_cities", "get_partner_categories",
-    "get_restaurant_subcategories"
+    "get_restaurant_subcategories", "get_catalog_filters", "encode_filters", "decode_filters"
 ]
@@ -1,8 +1,73 @@
 """
 Inline keyboards for Karma System bot.
 """
+import hashlib
 from aiogram.types import InlineKeyboardMarkup, InlineKeyboardButton
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Iterable, Optional
+
+# Catalog filters travel in callback data (64 bytes max, next to a cursor) as a
+# token of "."-joined items: sub-category code, "p" (has phone), "l" (has
+# location), "m<n>" (min priority) and "d<hash>" (district name hash)
+_SUB_SLUG_CODES = {"asia": "a", "europe": "e", "street": "s", "vege": "v"}
+_SUB_SLUG_BY_CODE = {code: sub_slug for sub_slug, code in _SUB_SLUG_CODES.items()}
+
+# District buttons shown under the catalog (largest districts first)
+FILTER_MAX_DISTRICTS = 4
+
+def district_code(district: str) -> str:
+    """Short stable hash of district name for callback data."""
+    return hashlib.md5(district.encode()).hexdigest()[:4]
+
+def encode_filters(filters: Optional[Dict[str, Any]]) -> str:
+    """Encode catalog filters as a callback data token ("" for none)."""
+    if not filters:
+        return ""
+    items = []
+    if filters.get('sub_slug') in _SUB_SLUG_CODES:
+        items.append(_SUB_SLUG_CODES[filters['sub_slug']])
+    if filters.get('has_phone'):
+        items.append("p")
+    if filters.get('has_location'):
+        items.append("l")
+    if filters.get('min_priority'):
+        items.append(f"m{int(filters['min_priority'])}")
+    if filters.get('district'):
+        items.append(f"d{district_code(filters['district'])}")
+    return ".".join(items)
+
+def decode_filters(token: str, districts: Iterable[str] = ()) -> Dict[str, Any]:
+    """
+    Decode token made by encode_filters. Full sub-category names ("asia",
+    "all") of older buttons are accepted too. A district hash is resolved
+    against `districts` and dropped when none matches.
+    """
+    filters: Dict[str, Any] = {}
+    for item in filter(None, token.split(".")):
+        if item in _SUB_SLUG_BY_CODE:
+            filters['sub_slug'] = _SUB_SLUG_BY_CODE[item]
+        elif item in _SUB_SLUG_CODES:
+            filters['sub_slug'] = item
+        elif item == "p":
+            filters['has_phone'] = True
+        elif item == "l":
+            filters['has_location'] = True
+        elif item[0] == "m" and item[1:].isdigit():
+            filters['min_priority'] = int(item[1:])
+        elif item[0] == "d":
+            for district in districts:
+                if district_code(district) == item[1:]:
+                    filters['district'] = district
+                    break
+    return filters
+
+def _toggled(filters: Optional[Dict[str, Any]], key: str, value: Any) -> Dict[str, Any]:
+    """Copy of filters with key set to value, or removed when it already has it."""
+    result = dict(filters or {})
+    if result.get(key) == value:
+        result.pop(key)
+    else:
+        result[key] = value
+    return result
 
 def get_language_selection() -> InlineKeyboardMarkup:
     """Get language selection keyboard."""
@@ -39,19 +104,33 @@ def get_categories() -> InlineKeyboardMarkup:
         ]
     ])
 
-def get_restaurant_filters() -> InlineKeyboardMarkup:
-    """Get restaurant filters keyboard."""
+def get_restaurant_filters(
+    facets: Optional[Dict[str, Any]] = None,
+    filters: Optional[Dict[str, Any]] = None
+) -> InlineKeyboardMarkup:
+    """Get restaurant filters keyboard (with listing counts when facets are given, keeping other filters)."""
+    def button(text: str, value: str) -> InlineKeyboardButton:
+        if facets is not None:
+            count = facets['sub_slug_total'] if value == "all" else facets['sub_slug'].get(value, 0)
+            text = f"{text} ({count})"
+        if value != "all" and (filters or {}).get('sub_slug') == value:
+            text = f"✅ {text}"
+        selected = {key: item for key, item in (filters or {}).items() if key != 'sub_slug'}
+        if value != "all":
+            selected['sub_slug'] = value
+        return InlineKeyboardButton(text=text, callback_data=f"filt:restaurants:{encode_filters(selected) or 'all'}")
+    
     return InlineKeyboardMarkup(inline_keyboard=[
         [
-            InlineKeyboardButton(text="🥢 Азиатская", callback_data="filt:restaurants:asia"),
-            InlineKeyboardButton(text="🍝 Европейская", callback_data="filt:restaurants:europe")
+            button("🥢 Азиатская", "asia"),
+            button("🍝 Европейская", "europe")
         ],
         [
-            InlineKeyboardButton(text="🌭 Стрит-фуд", callback_data="filt:restaurants:street"),
-            InlineKeyboardButton(text="🥗 Вегетарианская", callback_data="filt:restaurants:vege")
+            button("🌭 Стрит-фуд", "street"),
+            button("🥗 Вегетарианская", "vege")
         ],
         [
-            InlineKeyboardButton(text="🔎 Показать все", callback_data="filt:restaurants:all")
+            button("🔎 Показать все", "all")
         ]
     ])
 
@@ -95,25 +174,84 @@ def get_listing_card(listing_id: int, gmaps_url: str, can_create_qr: bool = Fals
     
     return InlineKeyboardMarkup(inline_keyboard=buttons)
 
-def get_pagination(category: str, page: int, total_pages: int) -> InlineKeyboardMarkup:
-    """Get pagination keyboard."""
+def get_catalog_filters(
+    category: str,
+    facets: Dict[str, Any],
+    filters: Optional[Dict[str, Any]] = None
+) -> InlineKeyboardMarkup:
+    """Get phone/location/priority/district filter toggles with listing counts from facets."""
+    filters = filters or {}
+    
+    def button(text: str, count: int, key: str, value: Any) -> InlineKeyboardButton:
+        mark = "✅ " if filters.get(key) == value else ""
+        token = encode_filters(_toggled(filters, key, value))
+        return InlineKeyboardButton(text=f"{mark}{text} ({count})", callback_data=f"filt:{category}:{token}")
+    
+    priority_count = sum(count for level, count in facets['priority'].items() if level >= 1)
+    buttons = [
+        [
+            button("☎ С телефоном", facets['has_phone'], 'has_phone', True),
+            button("📍 На карте", facets['has_location'], 'has_location', True)
+        ],
+        [button("⭐ Приоритетные", priority_count, 'min_priority', 1)]
+    ]
+    
+    districts = sorted(facets['district'].items(), key=lambda item: (-item[1], item[0]))[:FILTER_MAX_DISTRICTS]
+    if filters.get('district') and filters['district'] not in dict(districts):
+        districts[-1:] = [(filters['district'], facets['district'].get(filters['district'], 0))]
+    row = []
+    for district, count in districts:
+        row.append(button(district, count, 'district', district))
+        if len(row) == 2:
+            buttons.append(row)
+            row = []
+    if row:
+        buttons.append(row)
+    
+    if filters:
+        buttons.append([InlineKeyboardButton(text="✖ Сбросить фильтры", callback_data=f"filt:{category}:")])
+    return InlineKeyboardMarkup(inline_keyboard=buttons)
+
+def get_pagination(
+    category: str,
+    page: int,
+    total_pages: int,
+    next_cursor: Optional[str] = None,
+    prev_cursor: Optional[str] = None,
+    facets: Optional[Dict[str, Any]] = None,
+    filters: Optional[Dict[str, Any]] = None
+) -> InlineKeyboardMarkup:
+    """
+    Get pagination keyboard (cursor-based when cursors are provided); with
+    facets, filter toggles with counts follow. Active filters ride along in
+    the navigation callback data.
+    """
     buttons = []
+    token = encode_filters(filters)
+    
+    def page_data(number: int, cursor: Optional[str]) -> str:
+        data = f"pg:{category}:{number}"
+        if token:
+            return f"{data}:{cursor or ''}:{token}"
+        return f"{data}:{cursor}" if cursor else data
     
     # Navigation buttons
     nav_row = []
     if page > 1:
-        nav_row.append(InlineKeyboardButton(text="⬅️", callback_data=f"pg:{category}:{page-1}"))
+        nav_row.append(InlineKeyboardButton(text="⬅️", callback_data=page_data(page - 1, prev_cursor)))
     
     nav_row.append(InlineKeyboardButton(text=f"{page}/{total_pages}", callback_data="noop"))
     
     if page < total_pages:
-        nav_row.append(InlineKeyboardButton(text="➡️", callback_data=f"pg:{category}:{page+1}"))
+        nav_row.append(InlineKeyboardButton(text="➡️", callback_data=page_data(page + 1, next_cursor)))
     
     buttons.append(nav_row)
     
     # Add filters for restaurants
     if category == "restaurants":
-        buttons.extend(get_restaurant_filters().inline_keyboard)
+        buttons.extend(get_restaurant_filters(facets, filters).inline_keyboard)
+    if facets is not None:
+        buttons.extend(get_catalog_filters(category, facets, filters).inline_keyboard)
     
     return InlineKeyboardMarkup(inline_keyboard=buttons)
 
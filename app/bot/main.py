@@ -10,7 +10,10 @@ from aiogram.fsm.storage.redis import RedisStorage
 from aiogram.fsm.storage.memory import MemoryStorage
 
 from app.bot.middlewares import I18nMiddleware
-from app.bot.routers import start, menu, catalog, profile, partner, qr, help_router, geo
+from app.bot.routers import start, menu, catalog, profile, partner, qr, help_router, geo, inline_search
+from app.core.cache_subscriber import start_invalidation_subscriber, stop_invalidation_subscriber
+from app.core.db_listener import start_change_listener, stop_change_listener
+from app.core.redis_pool import get_redis, close_redis_pool
 
 # Load environment variables
 load_dotenv('.env.example')
@@ -34,7 +37,8 @@ async def main():
     redis_url = os.getenv('REDIS_URL')
     if redis_url:
         try:
-            storage = RedisStorage.from_url(redis_url)
+            # Shared pool with the cache and pub/sub
+            storage = RedisStorage(redis=get_redis())
             logger.info("Using Redis storage for FSM")
         except Exception as e:
             logger.warning(f"Failed to connect to Redis, using memory storage: {e}")
@@ -50,6 +54,7 @@ async def main():
     # Setup middlewares
     dp.message.middleware(I18nMiddleware())
     dp.callback_query.middleware(I18nMiddleware())
+    dp.inline_query.middleware(I18nMiddleware())
 
     # Include routers
     dp.include_router(start.router)
@@ -60,6 +65,13 @@ async def main():
     dp.include_router(qr.router)
     dp.include_router(help_router.router)
     dp.include_router(geo.router)
+    # Inline mode must also be enabled for the bot in @BotFather (/setinline)
+    dp.include_router(inline_search.router)
+
+    # Drop in-process cache entries when other processes invalidate
+    # (no-op when already started by the combined app process)
+    subscriber_task = start_invalidation_subscriber()
+    listener_task = start_change_listener()
 
     # Start polling
     logger.info("Starting Karma System bot...")
@@ -68,9 +80,19 @@ async def main():
     except Exception as e:
         logger.error(f"Error starting bot: {e}")
     finally:
+        await stop_invalidation_subscriber(subscriber_task)
+        await stop_change_listener(listener_task)
         await bot.session.close()
-        if hasattr(storage, 'close'):
+        # RedisStorage.close() would disconnect the shared pool; its owner closes it
+        if isinstance(storage, MemoryStorage):
             await storage.close()
 
+async def run():
+    """Standalone bot process: owns the shared Redis pool."""
+    try:
+        await main()
+    finally:
+        await close_redis_pool()
+
 if __name__ == "__main__":
-    asyncio.run(main())
+    asyncio.run(run())
@@ -1,6 +1,6 @@
 """
 Bot routers package.
 """
-from . import start, menu, catalog, profile, partner, qr, help_router, geo
+from . import start, menu, catalog, profile, partner, qr, help_router, geo, inline_search
 
-__all__ = ["start", "menu", "catalog", "profile", "partner", "qr", "help_router", "geo"]
+__all__ = ["start", "menu", "catalog", "profile", "partner", "qr", "help_router", "geo", "inline_search"]
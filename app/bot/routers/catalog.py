@@ -5,19 +5,34 @@ Handles category browsing, pagination, and filters.
 from aiogram import Router, F
 from aiogram.types import CallbackQuery
 
-from app.bot.keyboards.inline import get_pagination, get_listing_card
+from app.bot.keyboards.inline import get_pagination, get_listing_card, decode_filters
 from app.core.services.catalog_service import catalog_service
 from app.core.authz import authz_service
 
 router = Router()
 
-@router.callback_query(F.data.regexp(r"^pg:(restaurants|spa|transport|hotels|tours):[0-9]+$"))
+async def _resolve_filters(db, city_id: int, category: str, token: str) -> dict:
+    """Decode filters from callback data token; district hashes are matched against facet district names."""
+    filters = decode_filters(token)
+    if category != "restaurants":
+        filters.pop('sub_slug', None)
+    if any(item.startswith("d") for item in token.split(".")):
+        # District facet counts every district matching the other filters
+        facets = await catalog_service.get_facets(db, city_id, category, filters)
+        district = decode_filters(token, facets['district']).get('district')
+        if district:
+            filters['district'] = district
+    return filters
+
+@router.callback_query(F.data.regexp(r"^pg:(restaurants|spa|transport|hotels|tours):[0-9]+(:[A-Za-z0-9_-]*)?(:[a-z0-9.]*)?$"))
 async def show_category_page(callback: CallbackQuery, locale: str, _):
-    """Handle category pagination: ^pg:(restaurants|spa|transport|hotels|tours):[0-9]+$"""
+    """Handle category pagination: ^pg:(restaurants|spa|transport|hotels|tours):[0-9]+(:<cursor>)?(:<filters>)?$"""
     # Parse callback data
     parts = callback.data.split(":")
     category = parts[1]
     page = int(parts[2])
+    cursor = parts[3] if len(parts) > 3 and parts[3] else None
+    token = parts[4] if len(parts) > 4 else ""
     
     # TODO: Get user's city from database
     # user = await user_service.get_user(callback.from_user.id)
@@ -34,10 +49,23 @@ async def show_category_page(callback: CallbackQuery, locale: str, _):
     
     try:
         # Get catalog page
-        filters = {}  # Will be populated from callback data if needed
-        items, total_count, current_page, total_pages = await catalog_service.get_page(
-            db, city_id, category, page, per_page=5, filters=filters
-        )
+        filters = await _resolve_filters(db, city_id, category, token)
+        per_page = 5
+        next_cursor = prev_cursor = None
+        if cursor or page == 1:
+            # Keyset pagination: page number is only carried for display
+            # (page and filter menu counts come from one cache round trip)
+            await catalog_service.preload_view(city_id, category, cursor, per_page=per_page, filters=filters)
+            items, total_count, next_cursor, prev_cursor = await catalog_service.get_page_by_cursor(
+                db, city_id, category, cursor, per_page=per_page, filters=filters
+            )
+            current_page = page
+            total_pages = (total_count + per_page - 1) // per_page
+        else:
+            # Legacy offset callbacks without cursor
+            items, total_count, current_page, total_pages = await catalog_service.get_page(
+                db, city_id, category, page, per_page=per_page, filters=filters
+            )
         
         if not items:
             text = _("catalog_empty")
@@ -71,8 +99,14 @@ async def show_category_page(callback: CallbackQuery, locale: str, _):
             })
             keyboard_buttons.append(row_buttons)
         
-        # Add pagination
-        pagination_keyboard = get_pagination(category, current_page, total_pages)
+        # Filter menu counts come from one cached facet query
+        facets = await catalog_service.get_facets(db, city_id, category, filters)
+        
+        # Add pagination (active filters ride along in its callback data)
+        pagination_keyboard = get_pagination(
+            category, current_page, total_pages,
+            next_cursor=next_cursor, prev_cursor=prev_cursor, facets=facets, filters=filters
+        )
         
         # Combine keyboards
         from aiogram.types import InlineKeyboardMarkup, InlineKeyboardButton
@@ -97,11 +131,13 @@ async def show_category_page(callback: CallbackQuery, locale: str, _):
         await callback.answer("⚠️ Ошибка загрузки каталога")
         # TODO: Log error
 
-@router.callback_query(F.data.regexp(r"^filt:restaurants:(asia|europe|street|vege|all)$"))
-async def filter_restaurants(callback: CallbackQuery, locale: str, _):
-    """Handle restaurant filters: ^filt:restaurants:(asia|europe|street|vege|all)$"""
+@router.callback_query(F.data.regexp(r"^filt:(restaurants|spa|transport|hotels|tours):[a-z0-9.]*$"))
+async def filter_catalog(callback: CallbackQuery, locale: str, _):
+    """Handle catalog filters: ^filt:(restaurants|spa|transport|hotels|tours):<filters>$"""
     # Parse filter
-    filter_value = callback.data.split(":")[-1]
+    parts = callback.data.split(":")
+    category = parts[1]
+    token = parts[2]
     
     # TODO: Get user's city from database
     city_id = 1  # Stub: Nha Trang
@@ -114,15 +150,17 @@ async def filter_restaurants(callback: CallbackQuery, locale: str, _):
         return
     
     try:
-        # Apply filter
-        filters = {}
-        if filter_value != "all":
-            filters["sub_slug"] = filter_value
-        
-        # Get filtered results (page 1)
-        items, total_count, current_page, total_pages = await catalog_service.get_page(
-            db, city_id, "restaurants", 1, per_page=5, filters=filters
+        # Apply filter ("all" of older buttons decodes to no filters)
+        filters = await _resolve_filters(db, city_id, category, token)
+        
+        # Get filtered results (page 1, same keyset cache entry the warm-up fills)
+        per_page = 5
+        await catalog_service.preload_view(city_id, category, None, per_page=per_page, filters=filters)
+        items, total_count, next_cursor, prev_cursor = await catalog_service.get_page_by_cursor(
+            db, city_id, category, None, per_page=per_page, filters=filters
         )
+        current_page = 1
+        total_pages = (total_count + per_page - 1) // per_page
         
         # Build response (same as pagination handler)
         if not items:
@@ -153,8 +191,12 @@ async def filter_restaurants(callback: CallbackQuery, locale: str, _):
                 InlineKeyboardButton(text=f"{i+1}. ℹ️", callback_data=f"act:view:{item['id']}")
             ])
         
-        # Add pagination with filter
-        pagination_keyboard = get_pagination("restaurants", current_page, total_pages)
+        # Add pagination with filter (counts per option under the other filters)
+        facets = await catalog_service.get_facets(db, city_id, category, filters)
+        pagination_keyboard = get_pagination(
+            category, current_page, total_pages,
+            next_cursor=next_cursor, prev_cursor=prev_cursor, facets=facets, filters=filters
+        )
         combined_buttons.extend(pagination_keyboard.inline_keyboard)
         
         keyboard = InlineKeyboardMarkup(inline_keyboard=combined_buttons)
@@ -0,0 +1,127 @@
+"""
+Inline search router for Karma System bot.
+Handles inline queries (@bot <text>) with cached result sets.
+"""
+import logging
+import os
+from typing import Dict, List, Optional
+
+from aiogram import Router
+from aiogram.types import (
+    InlineQuery, InlineQueryResultArticle, InputTextMessageContent,
+    InlineKeyboardMarkup, InlineKeyboardButton
+)
+
+from app.bot.i18n import i18n
+from app.core.cache import get_cache
+from app.core.services.catalog_service import catalog_service, CATALOG_TTL, SEARCH_MIN_LENGTH
+from app.db.models import Category
+
+logger = logging.getLogger(__name__)
+
+router = Router()
+
+# Results per answer (Telegram shows up to 50) and deepest offset served
+INLINE_PAGE_SIZE = 20
+INLINE_MAX_OFFSET = 100
+
+# Seconds Telegram may reuse an answer without asking the bot again.
+# Answers depend on the user's city and language, so Telegram caches them per user.
+INLINE_CACHE_TIME = int(os.getenv("INLINE_CACHE_TIME", "300"))
+
+async def _results_key(city_id: int, locale: str, query: str, offset: int) -> str:
+    """
+    Cache key of one answer. It carries the generations of every category
+    of the city, so any catalog invalidation makes it unreachable.
+    """
+    cache = await get_cache()
+    categories = [category.value for category in Category]
+    city_gen, category_gens = await cache.get_catalog_generations(city_id, categories)
+    generations = ".".join(str(category_gens[category]) for category in categories)
+    query_hash = cache.make_filters_hash({"q": query})
+    return f"catalog:{city_id}:inline:g{city_gen}.{generations}:{locale}:{offset}:{query_hash}"
+
+def _article(item: Dict, locale: str) -> Dict:
+    """Serializable fields of one InlineQueryResultArticle."""
+    card = i18n.get(
+        "card_description",
+        locale,
+        description=item.get('description') or '',
+        address=item.get('address') or '',
+        district=item.get('district') or '',
+        phone=item.get('phone') or ''
+    )
+    return {
+        'id': str(item['id']),
+        'title': item['name'],
+        'description': " • ".join(part for part in (item.get('district'), item.get('address')) if part),
+        'message_text': f"{item['name']}\n{card}",
+        'gmaps_url': item.get('gmaps_url'),
+        'thumbnail_url': item.get('brand_logo_url')
+    }
+
+async def _load_results(city_id: int, locale: str, query: str, offset: int) -> Dict:
+    """Run catalog search and prebuild localized articles."""
+    from app.db.database import AsyncSessionLocal
+    async with AsyncSessionLocal() as db:
+        items, total_count = await catalog_service.search(db, city_id, query, limit=INLINE_PAGE_SIZE, offset=offset)
+    
+    next_offset = offset + len(items)
+    return {
+        'articles': [_article(item, locale) for item in items],
+        'next_offset': str(next_offset) if next_offset < min(total_count, INLINE_MAX_OFFSET) else ""
+    }
+
+def _to_result(article: Dict, locale: str) -> InlineQueryResultArticle:
+    """Build Telegram result from cached article fields."""
+    reply_markup = None
+    if article['gmaps_url']:
+        reply_markup = InlineKeyboardMarkup(inline_keyboard=[[
+            InlineKeyboardButton(text=i18n.get("buttons.show_map", locale), url=article['gmaps_url'])
+        ]])
+    return InlineQueryResultArticle(
+        id=article['id'],
+        title=article['title'],
+        description=article['description'] or None,
+        input_message_content=InputTextMessageContent(message_text=article['message_text']),
+        reply_markup=reply_markup,
+        thumbnail_url=article['thumbnail_url'] or None
+    )
+
+@router.inline_query()
+async def inline_search(inline_query: InlineQuery, locale: str, _):
+    """Handle inline search: @bot <text>"""
+    query = " ".join(inline_query.query.split()).casefold()
+    try:
+        offset = int(inline_query.offset or 0)
+    except ValueError:
+        offset = 0
+    
+    # TODO: Get user's city from database
+    city_id = 1  # Stub: Nha Trang
+    
+    results: List[InlineQueryResultArticle] = []
+    next_offset: Optional[str] = ""
+    if len(query) >= SEARCH_MIN_LENGTH and offset < INLINE_MAX_OFFSET:
+        try:
+            # Repeated queries of any user in the same city and language skip the DB
+            cache = await get_cache()
+            data = await cache.get_or_compute(
+                await _results_key(city_id, locale, query, offset),
+                lambda: _load_results(city_id, locale, query, offset),
+                ttl=CATALOG_TTL,
+                lock=True
+            )
+            results = [_to_result(article, locale) for article in data['articles']]
+            next_offset = data['next_offset']
+        except Exception as e:
+            logger.error(f"Inline search error for city {city_id}: {e}")
+            await inline_query.answer([], cache_time=5, is_personal=True)
+            return
+    
+    await inline_query.answer(
+        results,
+        cache_time=INLINE_CACHE_TIME,
+        is_personal=True,
+        next_offset=next_offset
+    )
@@ -1,112 +1,715 @@
 """
 Redis cache management for Karma System.
 """
+import asyncio
 import json
 import hashlib
-from typing import Any, Optional, Dict, List
+import random
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Optional, Dict, List, Tuple
 import redis.asyncio as redis
-from redis.exceptions import RedisError
+from redis.exceptions import RedisError, LockError
 import logging
 
+from app.core.cache_codec import CacheCodec, codec_from_env
+from app.core.metrics import (
+    CACHE_ERRORS, CACHE_HITS, CACHE_MISSES, CACHE_PAYLOAD_BYTES, key_prefix, redis_timer
+)
+
 logger = logging.getLogger(__name__)
 
+# Marker key of the envelope used for entries stored with a soft TTL
+SWR_MARKER = "__swr__"
+
+# Suffix of invalidation messages whose changed rows the DB change listener
+# already applied in memory (subscribers then skip full snapshot reloads)
+INVALIDATE_APPLIED = ";applied"
+
+class LocalCache:
+    """
+    Bounded in-process LRU cache with per-entry TTL.
+    Values are stored as-is (already decoded) and must be treated as read-only.
+    """
+    
+    def __init__(self, max_items: int = 1024, ttl: int = 30):
+        self.max_items = max_items
+        self.ttl = ttl
+        self._data: "OrderedDict[str, Tuple[float, Any]]" = OrderedDict()
+    
+    def get(self, key: str) -> Optional[Any]:
+        """Get value if present and not expired."""
+        entry = self._data.get(key)
+        if entry is None:
+            return None
+        
+        expires_at, value = entry
+        if expires_at <= time.monotonic():
+            del self._data[key]
+            return None
+        
+        self._data.move_to_end(key)
+        return value
+    
+    def set(self, key: str, value: Any, ttl: Optional[int] = None):
+        """Store value, evicting least recently used entries over the size bound."""
+        ttl = self.ttl if ttl is None else min(ttl, self.ttl)
+        self._data[key] = (time.monotonic() + ttl, value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.max_items:
+            self._data.popitem(last=False)
+    
+    def delete(self, key: str):
+        """Drop single key."""
+        self._data.pop(key, None)
+    
+    def delete_prefix(self, prefix: str) -> int:
+        """Drop all keys starting with prefix."""
+        keys = [key for key in self._data if key.startswith(prefix)]
+        for key in keys:
+            del self._data[key]
+        return len(keys)
+    
+    def clear(self):
+        """Drop all entries."""
+        self._data.clear()
+
 class CacheService:
-    """Redis cache service with fallback."""
+    """
+    Redis cache service with fallback and optional in-process L1.
+    
+    Every Redis call has a short socket timeout. After breaker_threshold
+    consecutive failures the circuit opens and callers skip Redis (falling
+    back to compute / DB) for breaker_cooldown seconds; the next failure after
+    the cooldown reopens it, the next success closes it. A failed connect is
+    retried in the background with exponential backoff.
+    """
     
-    def __init__(self, redis_url: str):
+    def __init__(
+        self,
+        redis_url: str,
+        l1: Optional[LocalCache] = None,
+        lock_timeout: float = 5.0,
+        generation_ttl: int = 5,
+        codec: Optional[CacheCodec] = None,
+        op_timeout: float = 0.25,
+        breaker_threshold: int = 5,
+        breaker_cooldown: float = 10.0,
+        max_backoff: float = 30.0,
+        connection_pool: Optional[redis.ConnectionPool] = None
+    ):
         self.redis_url = redis_url
+        self.codec = codec or CacheCodec()
         self.redis: Optional[redis.Redis] = None
         self.connected = False
+        self.l1 = l1
+        self.lock_timeout = lock_timeout
+        # Catalog generations are re-read from Redis at most every generation_ttl seconds
+        self._generations = LocalCache(max_items=4096, ttl=generation_ttl)
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self._refreshing: Dict[str, asyncio.Task] = {}
+        
+        # Connection health
+        self.op_timeout = op_timeout
+        self.breaker_threshold = breaker_threshold
+        self.breaker_cooldown = breaker_cooldown
+        self.max_backoff = max_backoff
+        self._failures = 0
+        self._open_until = 0.0
+        self._reconnect_delay = 1.0
+        self._next_reconnect = 0.0
+        self._reconnect_task: Optional[asyncio.Task] = None
+        # Shared pool (app.core.redis_pool) owns its own timeouts; op_timeout applies otherwise
+        self.connection_pool = connection_pool
     
-    async def connect(self):
-        """Connect to Redis."""
+    async def connect(self) -> bool:
+        """Connect to Redis; on failure the next attempt is scheduled with backoff."""
+        if self.connection_pool is not None:
+            client = redis.Redis(connection_pool=self.connection_pool)
+        else:
+            client = redis.from_url(
+                self.redis_url,
+                # Raw bytes: values are binary codec payloads
+                decode_responses=False,
+                socket_timeout=self.op_timeout,
+                socket_connect_timeout=self.op_timeout
+            )
         try:
-            self.redis = redis.from_url(self.redis_url, decode_responses=True)
-            await self.redis.ping()
-            self.connected = True
-            logger.info("Connected to Redis")
+            await client.ping()
         except Exception as e:
-            logger.error(f"Failed to connect to Redis: {e}")
+            logger.error(f"Failed to connect to Redis, retrying in {self._reconnect_delay:.0f}s: {e}")
+            await client.aclose()
             self.connected = False
+            self._next_reconnect = time.monotonic() + self._reconnect_delay
+            self._reconnect_delay = min(self._reconnect_delay * 2, self.max_backoff)
+            return False
+        
+        old_client, self.redis = self.redis, client
+        if old_client is not None:
+            await old_client.aclose()
+        self.connected = True
+        self._failures = 0
+        self._open_until = 0.0
+        self._reconnect_delay = 1.0
+        logger.info("Connected to Redis")
+        return True
     
-    async def get(self, key: str) -> Optional[Any]:
-        """Get value from cache."""
+    def _available(self) -> bool:
+        """
+        Whether Redis should be tried: connected and circuit not open.
+        While disconnected this schedules a background reconnect.
+        """
         if not self.connected or not self.redis:
+            self._schedule_reconnect()
+            return False
+        return time.monotonic() >= self._open_until
+    
+    def _schedule_reconnect(self):
+        """Start background connect unless one is running or backoff has not elapsed."""
+        if self._reconnect_task is not None and not self._reconnect_task.done():
+            return
+        if time.monotonic() < self._next_reconnect:
+            return
+        self._reconnect_task = asyncio.create_task(self.connect())
+    
+    def _record_failure(self, error: Exception, key: str, operation: str):
+        """Count failed operation; Redis failures open the circuit after breaker_threshold in a row."""
+        CACHE_ERRORS.labels(key_prefix(key), operation).inc()
+        if not isinstance(error, RedisError):
+            # Codec errors say nothing about Redis health
+            return
+        
+        self._failures += 1
+        if self._failures >= self.breaker_threshold:
+            now = time.monotonic()
+            if now >= self._open_until:
+                logger.warning(
+                    f"Redis circuit open for {self.breaker_cooldown:.0f}s "
+                    f"after {self._failures} consecutive failures"
+                )
+            self._open_until = now + self.breaker_cooldown
+    
+    def _record_success(self):
+        """Close the circuit after a successful Redis call."""
+        if self._failures >= self.breaker_threshold:
+            logger.info("Redis circuit closed")
+        self._failures = 0
+    
+    def pubsub(self):
+        """
+        Pub/sub object on the cache connection pool. Read it with
+        get_message(timeout=...): a blocking listen() would hit the short
+        per-call socket timeout between messages.
+        """
+        return self.redis.pubsub()
+    
+    async def get(self, key: str) -> Optional[Any]:
+        """Get value from cache, ignoring soft-TTL staleness."""
+        value, _ = await self.get_with_freshness(key)
+        return value
+    
+    async def get_with_freshness(self, key: str) -> Tuple[Optional[Any], bool]:
+        """
+        Get value from cache along with its staleness.
+        Returns: (value, is_stale); is_stale is only True for entries whose soft TTL passed.
+        """
+        return self._unwrap(await self._get_stored(key))
+    
+    def _unwrap(self, stored: Any) -> Tuple[Optional[Any], bool]:
+        """Split soft-TTL envelope into (value, is_stale)."""
+        if isinstance(stored, dict) and SWR_MARKER in stored:
+            return stored['value'], stored[SWR_MARKER] <= time.time()
+        return stored, False
+    
+    async def get_many(self, keys: List[str]) -> Dict[str, Any]:
+        """
+        Get several values (L1 first, then one MGET for the rest).
+        Returns only keys that were found; soft-TTL staleness is ignored.
+        """
+        found: Dict[str, Any] = {}
+        missing = []
+        for key in dict.fromkeys(keys):
+            value = self.l1.get(key) if self.l1 is not None else None
+            if value is not None:
+                CACHE_HITS.labels(key_prefix(key), "l1").inc()
+                found[key] = self._unwrap(value)[0]
+            else:
+                missing.append(key)
+        
+        if not missing:
+            return found
+        
+        values = [None] * len(missing)
+        if self._available():
+            try:
+                with redis_timer("mget"):
+                    values = await self.redis.mget(missing)
+                self._record_success()
+            except RedisError as e:
+                self._record_failure(e, missing[0], "mget")
+                logger.error(f"Cache get_many error for {len(missing)} keys: {e}")
+        
+        for key, value in zip(missing, values):
+            prefix = key_prefix(key)
+            if not value:
+                CACHE_MISSES.labels(prefix).inc()
+                continue
+            CACHE_PAYLOAD_BYTES.labels(prefix, "get").observe(len(value))
+            try:
+                decoded = self.codec.decode(value)
+            except ValueError as e:
+                self._record_failure(e, key, "decode")
+                logger.error(f"Cache get error for key {key}: {e}")
+                continue
+            CACHE_HITS.labels(prefix, "redis").inc()
+            if self.l1 is not None:
+                self.l1.set(key, decoded)
+            found[key] = self._unwrap(decoded)[0]
+        
+        return found
+    
+    async def _get_stored(self, key: str, record_miss: bool = True) -> Optional[Any]:
+        """Get stored value (L1 first, then Redis); record_miss=False keeps retries out of miss metrics."""
+        prefix = key_prefix(key)
+        if self.l1 is not None:
+            value = self.l1.get(key)
+            if value is not None:
+                CACHE_HITS.labels(prefix, "l1").inc()
+                return value
+        
+        if not self._available():
+            if record_miss:
+                CACHE_MISSES.labels(prefix).inc()
             return None
         
         try:
-            value = await self.redis.get(key)
+            with redis_timer("get"):
+                value = await self.redis.get(key)
+            self._record_success()
             if value:
-                return json.loads(value)
-        except (RedisError, json.JSONDecodeError) as e:
+                CACHE_PAYLOAD_BYTES.labels(prefix, "get").observe(len(value))
+                decoded = self.codec.decode(value)
+                CACHE_HITS.labels(prefix, "redis").inc()
+                if self.l1 is not None:
+                    self.l1.set(key, decoded)
+                return decoded
+        except (RedisError, ValueError) as e:
+            self._record_failure(e, key, "get")
             logger.error(f"Cache get error for key {key}: {e}")
         
+        if record_miss:
+            CACHE_MISSES.labels(prefix).inc()
         return None
     
-    async def set(self, key: str, value: Any, ttl: int = 300) -> bool:
-        """Set value in cache with TTL."""
-        if not self.connected or not self.redis:
+    async def set(self, key: str, value: Any, ttl: int = 300, soft_ttl: Optional[int] = None) -> bool:
+        """
+        Set value in cache with TTL.
+        With soft_ttl the entry is reported stale after soft_ttl seconds but
+        kept until the hard ttl, so readers can serve it while refreshing.
+        """
+        value = self._wrap(value, soft_ttl)
+        
+        if self.l1 is not None:
+            self.l1.set(key, value, ttl)
+        
+        if not self._available():
             return False
         
         try:
-            serialized = json.dumps(value, ensure_ascii=False)
-            await self.redis.setex(key, ttl, serialized)
+            serialized = self.codec.encode(value)
+            CACHE_PAYLOAD_BYTES.labels(key_prefix(key), "set").observe(len(serialized))
+            with redis_timer("set"):
+                await self.redis.setex(key, ttl, serialized)
+            self._record_success()
             return True
         except (RedisError, TypeError) as e:
+            self._record_failure(e, key, "set")
             logger.error(f"Cache set error for key {key}: {e}")
             return False
     
+    async def set_many(self, mapping: Dict[str, Any], ttl: int = 300, soft_ttl: Optional[int] = None) -> bool:
+        """Set several values with the same TTL in one pipelined round trip."""
+        if not mapping:
+            return True
+        
+        stored = {key: self._wrap(value, soft_ttl) for key, value in mapping.items()}
+        if self.l1 is not None:
+            for key, value in stored.items():
+                self.l1.set(key, value, ttl)
+        
+        if not self._available():
+            return False
+        
+        try:
+            async with self.redis.pipeline(transaction=False) as pipe:
+                for key, value in stored.items():
+                    serialized = self.codec.encode(value)
+                    CACHE_PAYLOAD_BYTES.labels(key_prefix(key), "set").observe(len(serialized))
+                    pipe.setex(key, ttl, serialized)
+                with redis_timer("set_many"):
+                    await pipe.execute()
+            self._record_success()
+            return True
+        except (RedisError, TypeError) as e:
+            self._record_failure(e, next(iter(mapping)), "set_many")
+            logger.error(f"Cache set_many error for {len(mapping)} keys: {e}")
+            return False
+    
+    def _wrap(self, value: Any, soft_ttl: Optional[int]) -> Any:
+        """Wrap value in soft-TTL envelope when soft_ttl is given."""
+        if soft_ttl is None:
+            return value
+        return {SWR_MARKER: time.time() + soft_ttl, 'value': value}
+    
     async def delete(self, key: str) -> bool:
         """Delete key from cache."""
-        if not self.connected or not self.redis:
+        if self.l1 is not None:
+            self.l1.delete(key)
+        
+        if not self._available():
             return False
         
         try:
-            await self.redis.delete(key)
+            with redis_timer("delete"):
+                await self.redis.delete(key)
+            self._record_success()
             return True
         except RedisError as e:
+            self._record_failure(e, key, "delete")
             logger.error(f"Cache delete error for key {key}: {e}")
             return False
     
-    async def delete_pattern(self, pattern: str) -> bool:
-        """Delete keys matching pattern."""
-        if not self.connected or not self.redis:
+    async def delete_many(self, keys: List[str]) -> bool:
+        """Delete several keys in one round trip."""
+        if not keys:
+            return True
+        
+        if self.l1 is not None:
+            for key in keys:
+                self.l1.delete(key)
+        
+        if not self._available():
             return False
         
         try:
-            keys = await self.redis.keys(pattern)
-            if keys:
+            with redis_timer("delete"):
                 await self.redis.delete(*keys)
+            self._record_success()
+            return True
+        except RedisError as e:
+            self._record_failure(e, keys[0], "delete")
+            logger.error(f"Cache delete_many error for {len(keys)} keys: {e}")
+            return False
+    
+    async def delete_pattern(self, pattern: str) -> bool:
+        """Delete keys matching pattern (incremental SCAN, not for hot paths)."""
+        if not self._available():
+            return False
+        
+        try:
+            batch = []
+            async for key in self.redis.scan_iter(match=pattern, count=500):
+                batch.append(key)
+                if len(batch) >= 500:
+                    await self.redis.delete(*batch)
+                    batch = []
+            if batch:
+                await self.redis.delete(*batch)
             return True
         except RedisError as e:
+            self._record_failure(e, pattern, "delete_pattern")
             logger.error(f"Cache delete pattern error for {pattern}: {e}")
             return False
     
+    async def get_or_compute(
+        self,
+        key: str,
+        compute: Callable[[], Awaitable[Any]],
+        ttl: int = 300,
+        lock: bool = False,
+        soft_ttl: Optional[int] = None,
+        refresh: Optional[Callable[[], Awaitable[Any]]] = None
+    ) -> Optional[Any]:
+        """
+        Get value from cache or compute it once for all concurrent callers.
+        
+        Concurrent misses in this process share one future. With lock=True a
+        Redis lock additionally lets only one worker recompute the key while
+        the others poll the cache until the lock timeout expires.
+        With soft_ttl a stale entry is returned immediately and, when refresh
+        is given, recomputed in a background task (refresh must not depend on
+        the caller's request-scoped resources such as its DB session).
+        None results are returned but never cached.
+        """
+        value, stale = await self.get_with_freshness(key)
+        if value is not None:
+            if stale and refresh is not None:
+                self._schedule_refresh(key, refresh, ttl, soft_ttl)
+            return value
+        
+        inflight = self._inflight.get(key)
+        if inflight is not None:
+            try:
+                return await asyncio.shield(inflight)
+            except asyncio.CancelledError:
+                if not inflight.cancelled():
+                    # This caller itself was cancelled
+                    raise
+                # Leader failed or was cancelled: compute on our own
+                return await compute()
+        
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        try:
+            value = await self._compute_locked(key, compute, ttl, lock, soft_ttl)
+            future.set_result(value)
+            return value
+        except BaseException:
+            # Waiters retry with their own compute (and their own DB session)
+            future.cancel()
+            raise
+        finally:
+            self._inflight.pop(key, None)
+    
+    async def _compute_locked(
+        self,
+        key: str,
+        compute: Callable[[], Awaitable[Any]],
+        ttl: int,
+        lock: bool,
+        soft_ttl: Optional[int] = None
+    ) -> Optional[Any]:
+        """Compute and store value, optionally under a Redis lock."""
+        redis_lock = None
+        if lock:
+            redis_lock, held_elsewhere = await self._acquire_lock(key)
+            if held_elsewhere:
+                value = await self._wait_for_value(key)
+                if value is not None:
+                    return value
+        
+        try:
+            value = await compute()
+            if value is not None:
+                await self.set(key, value, ttl, soft_ttl=soft_ttl)
+            return value
+        finally:
+            await self._release_lock(redis_lock)
+    
+    async def _acquire_lock(self, key: str) -> Tuple[Optional[Any], bool]:
+        """
+        Try to take the recompute lock for key without blocking.
+        Returns: (lock or None, held_elsewhere)
+        """
+        if not self._available():
+            return None, False
+        
+        try:
+            redis_lock = self.redis.lock(f"lock:{key}", timeout=self.lock_timeout)
+            with redis_timer("lock"):
+                acquired = await redis_lock.acquire(blocking=False)
+            if acquired:
+                return redis_lock, False
+            return None, True
+        except RedisError as e:
+            self._record_failure(e, f"lock:{key}", "lock")
+            logger.error(f"Cache lock error for key {key}: {e}")
+            return None, False
+    
+    async def _release_lock(self, redis_lock: Optional[Any]):
+        """Release lock taken by _acquire_lock."""
+        if redis_lock is None:
+            return
+        
+        try:
+            await redis_lock.release()
+        except (LockError, RedisError):
+            # Lock expired before compute finished
+            pass
+    
+    def _schedule_refresh(
+        self,
+        key: str,
+        refresh: Callable[[], Awaitable[Any]],
+        ttl: int,
+        soft_ttl: Optional[int]
+    ):
+        """Start background refresh of a stale key unless one is running."""
+        if key in self._refreshing:
+            return
+        self._refreshing[key] = asyncio.create_task(self._refresh(key, refresh, ttl, soft_ttl))
+    
+    async def _refresh(
+        self,
+        key: str,
+        refresh: Callable[[], Awaitable[Any]],
+        ttl: int,
+        soft_ttl: Optional[int]
+    ):
+        """Recompute stale key; skipped when another worker holds its lock."""
+        try:
+            redis_lock, held_elsewhere = await self._acquire_lock(key)
+            if held_elsewhere:
+                return
+            try:
+                value = await refresh()
+                if value is not None:
+                    await self.set(key, value, ttl, soft_ttl=soft_ttl)
+            finally:
+                await self._release_lock(redis_lock)
+        except Exception as e:
+            logger.error(f"Cache refresh error for key {key}: {e}")
+        finally:
+            self._refreshing.pop(key, None)
+    
+    async def _wait_for_value(
+        self,
+        key: str,
+        interval: float = 0.05,
+        max_interval: float = 0.5
+    ) -> Optional[Any]:
+        """
+        Poll cache while another worker holds the compute lock.
+        Intervals double up to max_interval with jitter, so waiters spread out
+        instead of hitting Redis together; polls are not counted as misses
+        (the caller's first lookup already was).
+        """
+        deadline = time.monotonic() + self.lock_timeout
+        while time.monotonic() < deadline:
+            await asyncio.sleep(interval * random.uniform(0.5, 1.5))
+            value, _ = self._unwrap(await self._get_stored(key, record_miss=False))
+            if value is not None:
+                return value
+            interval = min(interval * 2, max_interval)
+        return None
+    
+    async def claim_many(self, keys: List[str], ttl: int = 60) -> List[bool]:
+        """
+        Claim one-off work across processes (SET NX per key, one pipelined
+        round trip). True for keys this caller claimed first; all True when
+        Redis is unavailable so work is not lost.
+        """
+        if not keys:
+            return []
+        if not self._available():
+            return [True] * len(keys)
+        
+        try:
+            async with self.redis.pipeline(transaction=False) as pipe:
+                for key in keys:
+                    pipe.set(key, b"1", nx=True, ex=ttl)
+                with redis_timer("claim"):
+                    claimed = await pipe.execute()
+            self._record_success()
+            return [bool(value) for value in claimed]
+        except RedisError as e:
+            self._record_failure(e, keys[0], "claim")
+            logger.error(f"Cache claim error for {len(keys)} keys: {e}")
+            return [True] * len(keys)
+    
     async def publish(self, channel: str, message: str) -> bool:
         """Publish message to channel."""
-        if not self.connected or not self.redis:
+        if not self._available():
             return False
         
         try:
-            await self.redis.publish(channel, message)
+            with redis_timer("publish"):
+                await self.redis.publish(channel, message)
             return True
         except RedisError as e:
+            self._record_failure(e, channel, "publish")
             logger.error(f"Cache publish error for channel {channel}: {e}")
             return False
     
-    async def invalidate_city_cache(self, city_id: int):
-        """Invalidate catalog cache for city with fallback."""
+    async def invalidate_city_cache(self, city_id: int, category: Optional[str] = None, applied: bool = False):
+        """
+        Invalidate catalog cache for city (or one city category).
+        Bumps the generation baked into catalog keys, so a single INCR makes
+        every old entry unreachable; old entries then age out via TTL.
+        applied=True tells subscribers the DB change listener already
+        refreshed in-memory rows, so they do not rebuild them.
+        """
+        self.drop_local_catalog(city_id, category)
+        gen_key = self._generation_key(city_id, category)
+        
+        if not self._available():
+            return
+        
         try:
-            # Try PUB/SUB first
-            success = await self.publish(f"cache_invalidate:{city_id}", "1")
-            if not success:
-                # Fallback: direct deletion
-                pattern = f"catalog:{city_id}:*"
-                await self.delete_pattern(pattern)
-                logger.info(f"Fallback cache invalidation for city {city_id}")
-        except Exception as e:
+            with redis_timer("incr"):
+                generation = await self.redis.incr(gen_key)
+            self._record_success()
+            self._generations.set(gen_key, generation)
+            # Let other processes drop their L1 entries right away
+            message = (category or "*") + (INVALIDATE_APPLIED if applied else "")
+            await self.publish(f"cache_invalidate:{city_id}", message)
+        except RedisError as e:
+            self._record_failure(e, gen_key, "invalidate")
             logger.error(f"Cache invalidation error for city {city_id}: {e}")
     
+    def drop_local(self, keys: List[str], prefix: Optional[str] = None):
+        """Drop in-process copies of keys (and of keys starting with prefix)."""
+        if self.l1 is None:
+            return
+        for key in keys:
+            self.l1.delete(key)
+        if prefix:
+            self.l1.delete_prefix(prefix)
+    
+    def drop_local_catalog(self, city_id: int, category: Optional[str] = None):
+        """Drop in-process catalog entries and cached generations for city (or city category)."""
+        if self.l1 is not None:
+            prefix = f"catalog:{city_id}:{category}:" if category else f"catalog:{city_id}:"
+            self.l1.delete_prefix(prefix)
+        
+        if category:
+            self._generations.delete(self._generation_key(city_id, category))
+        else:
+            self._generations.delete_prefix(self._generation_key(city_id))
+    
+    def _generation_key(self, city_id: int, category: Optional[str] = None) -> str:
+        """Redis key holding catalog generation for city or city category."""
+        if category:
+            return f"catalog_gen:{city_id}:{category}"
+        return f"catalog_gen:{city_id}"
+    
+    async def get_catalog_generation(self, city_id: int, category: str) -> Tuple[int, int]:
+        """
+        Get (city generation, city+category generation).
+        Both are fetched with one MGET and cached locally for generation_ttl seconds.
+        """
+        city_gen, category_gens = await self.get_catalog_generations(city_id, [category])
+        return city_gen, category_gens[category]
+    
+    async def get_catalog_generations(self, city_id: int, categories: List[str]) -> Tuple[int, Dict[str, int]]:
+        """
+        Get (city generation, {category: city+category generation}).
+        Generations not cached locally are fetched with one MGET; all are 0
+        when Redis is unavailable.
+        """
+        keys = [self._generation_key(city_id)] + [self._generation_key(city_id, category) for category in categories]
+        values = [self._generations.get(key) for key in keys]
+        missing = [key for key, value in zip(keys, values) if value is None]
+        
+        if missing:
+            if not self._available():
+                return 0, {category: 0 for category in categories}
+            
+            try:
+                with redis_timer("mget"):
+                    fetched = dict(zip(missing, (int(value or 0) for value in await self.redis.mget(missing))))
+                self._record_success()
+            except (RedisError, ValueError) as e:
+                self._record_failure(e, keys[0], "generation")
+                logger.error(f"Cache generation error for city {city_id}: {e}")
+                return 0, {category: 0 for category in categories}
+            
+            for key, value in fetched.items():
+                self._generations.set(key, value)
+            values = [fetched[key] if value is None else value for key, value in zip(keys, values)]
+        
+        return values[0], dict(zip(categories, values[1:]))
+    
     def make_filters_hash(self, filters: Optional[Dict] = None) -> str:
         """Generate hash for filters to use in cache key."""
         if not filters:
@@ -115,10 +718,25 @@ class CacheService:
         filters_str = json.dumps(filters, sort_keys=True, ensure_ascii=False)
         return hashlib.md5(filters_str.encode()).hexdigest()[:8]
     
-    def make_catalog_key(self, city_id: int, category: str, page: int, filters: Optional[Dict] = None) -> str:
-        """Generate catalog cache key."""
+    async def make_catalog_key(
+        self,
+        city_id: int,
+        category: str,
+        page: Any,
+        filters: Optional[Dict] = None,
+        generation: Optional[Tuple[int, int]] = None
+    ) -> str:
+        """
+        Generate catalog cache key including city/category generations
+        (current ones unless `generation` read earlier is given).
+        """
         filters_hash = self.make_filters_hash(filters)
-        return f"catalog:{city_id}:{category}:{page}:{filters_hash}"
+        city_gen, category_gen = generation or await self.get_catalog_generation(city_id, category)
+        return f"catalog:{city_id}:{category}:g{city_gen}.{category_gen}:{page}:{filters_hash}"
+    
+    def make_listing_key(self, listing_id: int) -> str:
+        """Generate listing card cache key."""
+        return f"listing:{listing_id}"
 
 # Global cache instance
 cache_service: Optional[CacheService] = None
@@ -128,7 +746,21 @@ async def get_cache() -> CacheService:
     global cache_service
     if cache_service is None:
         import os
+        from app.core.redis_pool import get_redis_pool
         redis_url = os.getenv("REDIS_URL", "redis://localhost:6379/0")
-        cache_service = CacheService(redis_url)
+        l1_max_items = int(os.getenv("CACHE_L1_MAX_ITEMS", "1024"))
+        l1 = LocalCache(l1_max_items, int(os.getenv("CACHE_L1_TTL", "30"))) if l1_max_items > 0 else None
+        lock_timeout = float(os.getenv("CACHE_LOCK_TIMEOUT", "5"))
+        generation_ttl = int(os.getenv("CACHE_GENERATION_TTL", "5"))
+        cache_service = CacheService(
+            redis_url,
+            l1=l1,
+            lock_timeout=lock_timeout,
+            generation_ttl=generation_ttl,
+            codec=codec_from_env(),
+            breaker_threshold=int(os.getenv("CACHE_BREAKER_THRESHOLD", "5")),
+            breaker_cooldown=float(os.getenv("CACHE_BREAKER_COOLDOWN", "10")),
+            connection_pool=get_redis_pool()
+        )
         await cache_service.connect()
     return cache_service
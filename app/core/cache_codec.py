@@ -0,0 +1,157 @@
+"""
+Cache value codecs for Karma System.
+"""
+import json
+import logging
+import os
+import zlib
+from typing import Any, Optional
+
+logger = logging.getLogger(__name__)
+
+# Encoded values start with FORMAT_VERSION, then serializer and compression ids.
+# Anything else is a legacy plain-JSON entry written before codecs existed.
+FORMAT_VERSION = b"\x01"
+
+SERIALIZER_JSON = b"j"
+SERIALIZER_MSGPACK = b"m"
+SERIALIZER_ORJSON = b"o"
+
+COMPRESSION_NONE = b"-"
+COMPRESSION_ZLIB = b"z"
+COMPRESSION_LZ4 = b"l"
+
+def _load_msgpack():
+    try:
+        import msgpack
+        return msgpack
+    except ImportError:
+        return None
+
+def _load_orjson():
+    try:
+        import orjson
+        return orjson
+    except ImportError:
+        return None
+
+def _load_lz4():
+    try:
+        import lz4.frame
+        return lz4.frame
+    except ImportError:
+        return None
+
+class CacheCodec:
+    """
+    Binary codec for cache values: compact serializer plus optional
+    compression above a size threshold, behind a format-version header.
+    msgpack, orjson and lz4 are optional; missing ones fall back to json/zlib.
+    """
+    
+    def __init__(
+        self,
+        serializer: str = "auto",
+        compression: str = "zlib",
+        compress_threshold: int = 1024,
+        compress_level: int = 6
+    ):
+        self._msgpack = _load_msgpack()
+        self._orjson = _load_orjson()
+        self._lz4 = _load_lz4()
+        self.serializer = self._resolve_serializer(serializer)
+        self.compression = self._resolve_compression(compression)
+        self.compress_threshold = compress_threshold
+        self.compress_level = compress_level
+    
+    def _resolve_serializer(self, name: str) -> bytes:
+        """Pick serializer id, falling back to json when the library is missing."""
+        if name in ("auto", "msgpack") and self._msgpack:
+            return SERIALIZER_MSGPACK
+        if name in ("auto", "orjson") and self._orjson:
+            return SERIALIZER_ORJSON
+        if name not in ("auto", "json"):
+            logger.warning(f"Cache serializer {name} not available, using json")
+        return SERIALIZER_JSON
+    
+    def _resolve_compression(self, name: str) -> bytes:
+        """Pick compression id, falling back to zlib when lz4 is missing."""
+        if name == "none":
+            return COMPRESSION_NONE
+        if name == "lz4":
+            if self._lz4:
+                return COMPRESSION_LZ4
+            logger.warning("Cache compression lz4 not available, using zlib")
+        return COMPRESSION_ZLIB
+    
+    def encode(self, value: Any) -> bytes:
+        """Serialize value; raises TypeError for unserializable values."""
+        try:
+            if self.serializer == SERIALIZER_MSGPACK:
+                payload = self._msgpack.packb(value, use_bin_type=True)
+            elif self.serializer == SERIALIZER_ORJSON:
+                payload = self._orjson.dumps(value)
+            else:
+                payload = json.dumps(value, ensure_ascii=False, separators=(",", ":")).encode()
+        except TypeError:
+            raise
+        except Exception as e:
+            raise TypeError(f"Cannot serialize cache value: {e}")
+        
+        compression = COMPRESSION_NONE
+        if self.compression != COMPRESSION_NONE and len(payload) >= self.compress_threshold:
+            compression = self.compression
+            if compression == COMPRESSION_LZ4:
+                payload = self._lz4.compress(payload)
+            else:
+                payload = zlib.compress(payload, self.compress_level)
+        
+        return FORMAT_VERSION + self.serializer + compression + payload
+    
+    def decode(self, data: Any) -> Any:
+        """Deserialize value (new format or legacy JSON); raises ValueError."""
+        if isinstance(data, str):
+            data = data.encode()
+        
+        if not data.startswith(FORMAT_VERSION):
+            try:
+                return json.loads(data)
+            except ValueError as e:
+                raise ValueError(f"Invalid legacy cache entry: {e}")
+        
+        serializer = data[1:2]
+        compression = data[2:3]
+        payload = data[3:]
+        try:
+            if compression == COMPRESSION_ZLIB:
+                payload = zlib.decompress(payload)
+            elif compression == COMPRESSION_LZ4:
+                payload = self._require(self._lz4, "lz4").decompress(payload)
+            elif compression != COMPRESSION_NONE:
+                raise ValueError(f"unknown compression {compression!r}")
+            
+            if serializer == SERIALIZER_MSGPACK:
+                return self._require(self._msgpack, "msgpack").unpackb(payload, raw=False)
+            if serializer == SERIALIZER_ORJSON:
+                return self._require(self._orjson, "orjson").loads(payload)
+            if serializer == SERIALIZER_JSON:
+                return json.loads(payload)
+            raise ValueError(f"unknown serializer {serializer!r}")
+        except ValueError:
+            raise
+        except Exception as e:
+            raise ValueError(f"Invalid cache entry: {e}")
+    
+    def _require(self, module: Optional[Any], name: str) -> Any:
+        """Return optional module or fail decoding when it is not installed."""
+        if module is None:
+            raise ValueError(f"{name} is not installed")
+        return module
+
+def codec_from_env() -> CacheCodec:
+    """Build codec from CACHE_SERIALIZER / CACHE_COMPRESSION / CACHE_COMPRESS_THRESHOLD."""
+    return CacheCodec(
+        serializer=os.getenv("CACHE_SERIALIZER", "auto"),
+        compression=os.getenv("CACHE_COMPRESSION", "zlib"),
+        compress_threshold=int(os.getenv("CACHE_COMPRESS_THRESHOLD", "1024"))
+    )
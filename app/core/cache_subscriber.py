@@ -0,0 +1,108 @@
+"""
+Cross-process cache invalidation subscriber for Karma System.
+"""
+import asyncio
+import logging
+from typing import Any, Optional
+
+from redis.exceptions import RedisError
+
+from app.core.cache import CacheService, INVALIDATE_APPLIED, get_cache
+from app.core.db_listener import is_listening
+from app.core.services.catalog_service import catalog_service
+
+logger = logging.getLogger(__name__)
+
+INVALIDATE_PATTERN = "cache_invalidate:*"
+
+_subscriber_task: Optional[asyncio.Task] = None
+
+def handle_invalidation(cache: CacheService, channel: Any, data: Any):
+    """Apply invalidation message published by CacheService.invalidate_city_cache."""
+    # Cache client runs without decode_responses
+    if isinstance(channel, bytes):
+        channel = channel.decode()
+    if isinstance(data, bytes):
+        data = data.decode()
+    
+    try:
+        city_id = int(channel.rsplit(":", 1)[1])
+    except (IndexError, ValueError):
+        logger.warning(f"Ignoring invalidation on unexpected channel {channel}")
+        return
+    
+    applied = data.endswith(INVALIDATE_APPLIED)
+    if applied:
+        data = data[:-len(INVALIDATE_APPLIED)]
+    category = None if data in ("*", "1", "") else data
+    cache.drop_local_catalog(city_id, category)
+    if not (applied and is_listening()):
+        # The publisher deleted the affected cards in Redis; drop in-process copies.
+        # Changes seen by this process's own DB listener were already applied row by row.
+        cache.drop_local([], prefix="listing:")
+        catalog_service.invalidate_snapshot(city_id, category)
+    catalog_service.schedule_warm_up(city_id, category)
+
+async def run_invalidation_subscriber(max_backoff: float = 30.0):
+    """
+    Listen on cache_invalidate:* and drop matching in-process entries, then
+    re-warm the affected catalog pages.
+    Redis entries need no deletion: the publisher already bumped the catalog
+    generation, so old keys are unreachable and age out via TTL.
+    Reconnects with exponential backoff until cancelled.
+    """
+    backoff = 1.0
+    while True:
+        pubsub = None
+        try:
+            cache = await get_cache()
+            if not cache.connected:
+                raise RedisError("Redis not connected")
+            
+            pubsub = cache.pubsub()
+            await pubsub.psubscribe(INVALIDATE_PATTERN)
+            logger.info("Cache invalidation subscriber started")
+            backoff = 1.0
+            
+            while True:
+                # Poll instead of listen(): the shared pool's socket timeout is shorter than idle gaps
+                message = await pubsub.get_message(ignore_subscribe_messages=True, timeout=1.0)
+                if message is None or message.get("type") != "pmessage":
+                    continue
+                handle_invalidation(cache, message["channel"], message["data"])
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.warning(f"Cache invalidation subscriber error, retrying in {backoff:.0f}s: {e}")
+            await asyncio.sleep(backoff)
+            backoff = min(backoff * 2, max_backoff)
+        finally:
+            if pubsub is not None:
+                try:
+                    await pubsub.close()
+                except Exception:
+                    pass
+
+def start_invalidation_subscriber() -> Optional[asyncio.Task]:
+    """
+    Start the subscriber once per process.
+    Returns the task if this call started it (the caller owns cancelling it),
+    None when it is already running.
+    """
+    global _subscriber_task
+    if _subscriber_task is not None and not _subscriber_task.done():
+        return None
+    
+    _subscriber_task = asyncio.create_task(run_invalidation_subscriber())
+    return _subscriber_task
+
+async def stop_invalidation_subscriber(task: Optional[asyncio.Task]):
+    """Cancel subscriber task returned by start_invalidation_subscriber."""
+    if task is None:
+        return
+    
+    task.cancel()
+    try:
+        await task
+    except asyncio.CancelledError:
+        pass
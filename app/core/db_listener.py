@@ -0,0 +1,204 @@
+"""
+Postgres change feed (LISTEN/NOTIFY) listener for Karma System.
+"""
+import asyncio
+import json
+import logging
+import os
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+import asyncpg
+
+from app.core.cache import CacheService, get_cache
+from app.core.services.catalog_service import catalog_service
+
+logger = logging.getLogger(__name__)
+
+# Channel notified by the triggers from migration 0003
+CHANGE_CHANNEL = "karma_changes"
+
+# Events arriving within this many seconds are handled as one batch
+CHANGE_BATCH_DELAY = 0.2
+
+# Seconds without events after which the connection is probed
+CHANGE_IDLE_PING = 30.0
+
+# Run listener in this process (triggers without listeners cost nothing)
+DB_CHANGE_LISTENER = os.getenv("DB_CHANGE_LISTENER", "1") == "1"
+
+_listener_task: Optional[asyncio.Task] = None
+
+def _targets(events: List[Dict]) -> Tuple[Set[Tuple[int, Optional[str]]], Set[int], Set[int]]:
+    """
+    Collect what a batch of events touches.
+    Returns: (catalog (city_id, category) pairs, listing ids, city ids)
+    """
+    catalog: Set[Tuple[int, Optional[str]]] = set()
+    listing_ids: Set[int] = set()
+    city_ids: Set[int] = set()
+    
+    for event in events:
+        table = event.get("table")
+        if table == "listings":
+            listing_ids.add(event["id"])
+            # A moved listing leaves its old catalog too
+            for city_id, category in (
+                (event.get("city_id"), event.get("category")),
+                (event.get("old_city_id"), event.get("old_category"))
+            ):
+                if city_id is not None:
+                    catalog.add((city_id, category))
+        elif table == "cities":
+            city_ids.add(event["id"])
+        elif table == "system_settings":
+            # Settings are read from the DB on use; nothing cached depends on them yet
+            logger.info(f"System setting {event.get('key')} changed ({event.get('op')})")
+    
+    # Whole-city invalidation already covers the city's categories
+    catalog = {(city_id, category) for city_id, category in catalog if city_id not in city_ids}
+    return catalog, listing_ids, city_ids
+
+def _claim_key(event: Dict) -> str:
+    """Redis key deduplicating shared work for one change across processes."""
+    return f"change:{event.get('tx')}:{event.get('table')}:{event.get('id', event.get('key'))}"
+
+async def handle_changes(cache: CacheService, events: List[Dict]):
+    """
+    Apply a batch of change events.
+    Every process updates its own L1 and snapshots; the Redis side (generation
+    bumps, card deletes, invalidation messages) is done once per change by
+    the process that claims it.
+    """
+    catalog, listing_ids, city_ids = _targets(events)
+    
+    # In-process state
+    cache.drop_local(
+        [cache.make_listing_key(listing_id) for listing_id in listing_ids],
+        prefix="listing:" if city_ids else None
+    )
+    for city_id, category in catalog:
+        cache.drop_local_catalog(city_id, category)
+    if city_ids:
+        # A city may have been (de)activated
+        await catalog_service.load_active_cities()
+    for city_id in city_ids:
+        cache.drop_local_catalog(city_id)
+        catalog_service.invalidate_snapshot(city_id)
+    await catalog_service.refresh_snapshot_listings(sorted(listing_ids))
+    
+    # Shared Redis state, once per change
+    claims = await cache.claim_many([_claim_key(event) for event in events])
+    claimed = [event for event, won in zip(events, claims) if won]
+    if not claimed:
+        return
+    
+    catalog, listing_ids, city_ids = _targets(claimed)
+    if city_ids:
+        # Cards embed the city name
+        listing_ids |= set(await catalog_service.get_city_listing_ids(sorted(city_ids)))
+    await cache.delete_many([cache.make_listing_key(listing_id) for listing_id in sorted(listing_ids)])
+    # Every listening process applied the rows above; subscribers need not reload
+    for city_id, category in catalog:
+        await cache.invalidate_city_cache(city_id, category, applied=True)
+    for city_id in sorted(city_ids):
+        await cache.invalidate_city_cache(city_id, applied=True)
+    
+    logger.info(
+        f"Applied {len(claimed)} DB changes: {len(catalog)} catalogs, "
+        f"{len(city_ids)} cities, {len(listing_ids)} cards"
+    )
+
+def _parse(payloads: List[str]) -> List[Dict]:
+    """Decode NOTIFY payloads, skipping malformed ones."""
+    events = []
+    for payload in payloads:
+        try:
+            event = json.loads(payload)
+        except ValueError:
+            logger.warning(f"Ignoring malformed change payload: {payload[:200]}")
+            continue
+        if isinstance(event, dict):
+            events.append(event)
+    return events
+
+async def run_change_listener(max_backoff: float = 30.0):
+    """
+    LISTEN on the change channel and apply events in small batches.
+    Reconnects with exponential backoff until cancelled; changes made while
+    disconnected are only picked up by cache TTLs and snapshot max age.
+    """
+    from app.db.database import DATABASE_URL
+    dsn = DATABASE_URL.replace("postgresql+asyncpg://", "postgresql://", 1)
+    queue: asyncio.Queue = asyncio.Queue()
+    
+    def on_notify(connection: Any, pid: int, channel: str, payload: str):
+        queue.put_nowait(payload)
+    
+    backoff = 1.0
+    while True:
+        connection = None
+        try:
+            connection = await asyncpg.connect(dsn)
+            await connection.add_listener(CHANGE_CHANNEL, on_notify)
+            logger.info("DB change listener started")
+            backoff = 1.0
+            
+            while True:
+                try:
+                    payload = await asyncio.wait_for(queue.get(), timeout=CHANGE_IDLE_PING)
+                except asyncio.TimeoutError:
+                    # Idle: a dead connection would otherwise go unnoticed
+                    await connection.execute("SELECT 1")
+                    continue
+                
+                await asyncio.sleep(CHANGE_BATCH_DELAY)
+                payloads = [payload]
+                while not queue.empty():
+                    payloads.append(queue.get_nowait())
+                
+                try:
+                    await handle_changes(await get_cache(), _parse(payloads))
+                except Exception as e:
+                    logger.error(f"DB change handling error for {len(payloads)} events: {e}")
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.warning(f"DB change listener error, retrying in {backoff:.0f}s: {e}")
+            await asyncio.sleep(backoff)
+            backoff = min(backoff * 2, max_backoff)
+        finally:
+            if connection is not None:
+                try:
+                    await connection.close()
+                except Exception:
+                    pass
+
+def is_listening() -> bool:
+    """Whether this process runs the change listener (and so applies changed rows itself)."""
+    return _listener_task is not None and not _listener_task.done()
+
+def start_change_listener() -> Optional[asyncio.Task]:
+    """
+    Start the listener once per process (unless DB_CHANGE_LISTENER=0).
+    Returns the task if this call started it (the caller owns cancelling it),
+    None otherwise.
+    """
+    global _listener_task
+    if not DB_CHANGE_LISTENER:
+        return None
+    if _listener_task is not None and not _listener_task.done():
+        return None
+    
+    _listener_task = asyncio.create_task(run_change_listener())
+    return _listener_task
+
+async def stop_change_listener(task: Optional[asyncio.Task]):
+    """Cancel listener task returned by start_change_listener."""
+    if task is None:
+        return
+    
+    task.cancel()
+    try:
+        await task
+    except asyncio.CancelledError:
+        pass
@@ -0,0 +1,48 @@
+"""
+Prometheus metrics for Karma System.
+"""
+import time
+from contextlib import contextmanager
+
+from prometheus_client import Counter, Histogram
+
+CACHE_HITS = Counter(
+    "cache_hits_total",
+    "Cache reads served from cache",
+    ["prefix", "layer"]
+)
+CACHE_MISSES = Counter(
+    "cache_misses_total",
+    "Cache reads not found in cache",
+    ["prefix"]
+)
+CACHE_ERRORS = Counter(
+    "cache_errors_total",
+    "Failed cache operations (Redis or codec errors)",
+    ["prefix", "operation"]
+)
+CACHE_PAYLOAD_BYTES = Histogram(
+    "cache_payload_bytes",
+    "Serialized cache value size",
+    ["prefix", "operation"],
+    buckets=(64, 256, 1024, 4096, 16384, 65536, 262144, 1048576)
+)
+REDIS_LATENCY = Histogram(
+    "cache_redis_latency_seconds",
+    "Redis call latency as seen by CacheService",
+    ["operation"],
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0)
+)
+
+def key_prefix(key: str) -> str:
+    """Metric label for a cache key: its first segment (catalog, listing, ...)."""
+    return key.split(":", 1)[0]
+
+@contextmanager
+def redis_timer(operation: str):
+    """Observe duration of the wrapped Redis call, failed calls included."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        REDIS_LATENCY.labels(operation).observe(time.perf_counter() - start)
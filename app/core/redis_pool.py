@@ -0,0 +1,48 @@
+"""
+Shared Redis connection pool for Karma System.
+"""
+import logging
+import os
+from typing import Optional
+
+import redis.asyncio as redis
+
+logger = logging.getLogger(__name__)
+
+_pool: Optional[redis.BlockingConnectionPool] = None
+
+def get_redis_pool() -> redis.BlockingConnectionPool:
+    """
+    Process-wide Redis pool shared by FSM storage, cache and pub/sub.
+    When all REDIS_MAX_CONNECTIONS are busy callers wait up to
+    REDIS_POOL_TIMEOUT seconds for a free one instead of opening more.
+    Responses are raw bytes: cache values are binary codec payloads and
+    aiogram storage decodes its own values.
+    """
+    global _pool
+    if _pool is None:
+        max_connections = int(os.getenv("REDIS_MAX_CONNECTIONS", "20"))
+        _pool = redis.BlockingConnectionPool.from_url(
+            os.getenv("REDIS_URL", "redis://localhost:6379/0"),
+            max_connections=max_connections,
+            timeout=float(os.getenv("REDIS_POOL_TIMEOUT", "0.25")),
+            health_check_interval=int(os.getenv("REDIS_HEALTH_CHECK_INTERVAL", "30")),
+            socket_timeout=float(os.getenv("REDIS_SOCKET_TIMEOUT", "0.25")),
+            socket_connect_timeout=float(os.getenv("REDIS_SOCKET_CONNECT_TIMEOUT", "0.5")),
+            decode_responses=False
+        )
+        logger.info(f"Redis pool created (max {max_connections} connections)")
+    return _pool
+
+def get_redis() -> redis.Redis:
+    """Redis client on the shared pool (closing it leaves the pool open)."""
+    return redis.Redis(connection_pool=get_redis_pool())
+
+async def close_redis_pool():
+    """Disconnect all pooled connections; called once on process shutdown."""
+    global _pool
+    if _pool is None:
+        return
+    
+    await _pool.disconnect()
+    _pool = None
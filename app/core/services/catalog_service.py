@@ -1,21 +1,155 @@
 """
 Catalog service for Karma System.
 """
+import asyncio
+import base64
+import binascii
 import hashlib
 import json
+import logging
+import os
+import struct
+import time
+from datetime import datetime, timedelta
 from typing import Dict, List, Optional, Tuple, Any
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, func, and_, or_
-from sqlalchemy.orm import selectinload
+from sqlalchemy import select, func, and_, or_, tuple_, literal_column, any_, bindparam, Integer
+from sqlalchemy.dialects.postgresql import ARRAY
 
 from app.db.models import Listing, City, Category, PartnerStatus
 from app.core.cache import get_cache
+from app.core.services.listing_suggest import ListingSuggestIndex
+
+logger = logging.getLogger(__name__)
+
+# Cursor layout: direction flag, priority_level, created_at (µs since epoch), id
+_CURSOR_STRUCT = struct.Struct(">Biqi")
+_CURSOR_FORWARD = 0
+_CURSOR_BACKWARD = 1
+_EPOCH = datetime(1970, 1, 1)
+
+# Catalog sort columns with NULLs mapped the way cursors encode them (priority 0,
+# created_at epoch), so ORDER BY, seek predicates and cursors agree on NULL rows.
+# Matched by the expression indexes from migration 0005.
+SORT_PRIORITY = func.coalesce(Listing.priority_level, literal_column("0"))
+SORT_CREATED_AT = func.coalesce(Listing.created_at, literal_column("'1970-01-01 00:00:00'::timestamp"))
+
+# Catalog pages are fresh for CATALOG_TTL seconds, then served stale while a
+# background refresh runs, until CATALOG_TTL + CATALOG_STALE_TTL
+CATALOG_TTL = 300
+CATALOG_STALE_TTL = 600
+
+# Restaurant sub-categories offered by the bot filters
+RESTAURANT_SUB_SLUGS = ("asia", "europe", "street", "vege")
+
+# Warm-up: pages per category/filter to precompute (0 disables) and max parallel queries
+CATALOG_WARMUP_PAGES = int(os.getenv("CATALOG_WARMUP_PAGES", "1"))
+CATALOG_WARMUP_CONCURRENCY = int(os.getenv("CATALOG_WARMUP_CONCURRENCY", "4"))
+# Bot page size; warm-up fills the same keys the bot reads
+CATALOG_WARMUP_PER_PAGE = 5
+
+# Pages fetched by one query on a cache miss (requested page plus following ones)
+CATALOG_PREFETCH_PAGES = int(os.getenv("CATALOG_PREFETCH_PAGES", "3"))
+
+# Serve catalog pages and cards from per-city in-memory snapshots (Redis/DB as fallback)
+CATALOG_SNAPSHOT = os.getenv("CATALOG_SNAPSHOT", "0") == "1"
+CATALOG_SNAPSHOT_MAX_AGE = int(os.getenv("CATALOG_SNAPSHOT_MAX_AGE", "300"))
+# Snapshot file new workers start from instead of the DB (empty disables)
+CATALOG_SNAPSHOT_FILE = os.getenv("CATALOG_SNAPSHOT_FILE", "")
+
+# Text search configurations matching the search_vector trigger (migration 0004)
+SEARCH_CONFIGS = ("simple", "russian", "english")
+SEARCH_MIN_LENGTH = 2
+SEARCH_MAX_LENGTH = 100
+
+# Catalog filters besides restaurant sub_slug, and the facets counted for filter menus
+CATALOG_FILTER_KEYS = ("district", "has_phone", "has_location", "min_priority")
+FACET_NAMES = ("district", "sub_slug", "has_phone", "has_location", "priority")
+
+# Cached listing cards live this many seconds; batch lookups accept at most CATALOG_BATCH_MAX ids
+LISTING_TTL = 300
+CATALOG_BATCH_MAX = 100
+
+# Autocomplete index of a city is rebuilt in the background after this many seconds
+CATALOG_SUGGEST_MAX_AGE = int(os.getenv("CATALOG_SUGGEST_MAX_AGE", "300"))
+
+# Active city list bounding snapshots and suggest indexes: re-read after this
+# many seconds, and retried this many seconds after a failed read
+CATALOG_CITIES_TTL = int(os.getenv("CATALOG_CITIES_TTL", "300"))
+CATALOG_CITIES_RETRY = 10
+
+# Columns needed to build catalog items and cursors; selected instead of full entities
+CATALOG_COLUMNS = (
+    Listing.id,
+    Listing.name,
+    Listing.description,
+    Listing.address,
+    Listing.district,
+    Listing.phone,
+    Listing.gmaps_url,
+    Listing.brand_logo_url,
+    Listing.category,
+    Listing.sub_slug,
+    Listing.partner_profile_id,
+    Listing.user_id,
+    Listing.priority_level,
+    Listing.created_at
+)
+
+# Boolean facet expressions shared by filters and facet counts
+HAS_PHONE = and_(Listing.phone.isnot(None), Listing.phone != '')
+HAS_LOCATION = and_(Listing.latitude.isnot(None), Listing.longitude.isnot(None))
+
+def encode_cursor(priority_level: Optional[int], created_at: Optional[datetime], listing_id: int, backward: bool = False) -> str:
+    """Encode listing sort key into an opaque URL-safe cursor."""
+    created_us = (created_at - _EPOCH) // timedelta(microseconds=1) if created_at else 0
+    raw = _CURSOR_STRUCT.pack(
+        _CURSOR_BACKWARD if backward else _CURSOR_FORWARD,
+        priority_level or 0,
+        created_us,
+        listing_id
+    )
+    return base64.urlsafe_b64encode(raw).rstrip(b"=").decode()
+
+def decode_cursor(cursor: str) -> Tuple[bool, int, datetime, int]:
+    """
+    Decode cursor produced by encode_cursor.
+    Returns: (backward, priority_level, created_at, listing_id)
+    """
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        direction, priority_level, created_us, listing_id = _CURSOR_STRUCT.unpack(raw)
+    except (binascii.Error, struct.error, ValueError):
+        raise ValueError("Invalid cursor")
+    
+    if direction not in (_CURSOR_FORWARD, _CURSOR_BACKWARD):
+        raise ValueError("Invalid cursor")
+    
+    return (
+        direction == _CURSOR_BACKWARD,
+        priority_level,
+        _EPOCH + timedelta(microseconds=created_us),
+        listing_id
+    )
 
 class CatalogService:
     """Service for catalog operations with caching."""
     
     def __init__(self):
         self.cache = None
+        self._warmup_tasks: Dict[Tuple[int, Optional[str]], asyncio.Task] = {}
+        self.snapshots = None
+        if CATALOG_SNAPSHOT:
+            from app.core.services.catalog_snapshot import CatalogSnapshotEngine
+            self.snapshots = CatalogSnapshotEngine(
+                self._row_to_item,
+                max_age=CATALOG_SNAPSHOT_MAX_AGE,
+                generations=self._catalog_generation
+            )
+        self.suggestions = ListingSuggestIndex(max_age=CATALOG_SUGGEST_MAX_AGE)
+        self._cities_loaded_at: Optional[float] = None
+        self._cities_retry_at = 0.0
+        self._cities_task: Optional[asyncio.Task] = None
     
     async def _get_cache(self):
         """Get cache service instance."""
@@ -23,13 +157,92 @@ class CatalogService:
             self.cache = await get_cache()
         return self.cache
     
-    def _make_filters_hash(self, filters: Optional[Dict] = None) -> str:
-        """Generate hash for filters to use in cache key."""
-        if not filters:
-            return "none"
+    def _catalog_conditions(self, city_id: int, category: Optional[str], filters: Optional[Dict] = None) -> List[Any]:
+        """Build WHERE conditions shared by catalog page, count and search queries (category None = all)."""
+        conditions = [
+            Listing.city_id == city_id,
+            # Inlined literal so the partial catalog index predicate matches
+            # even under generic prepared-statement plans
+            Listing.moderation_status == literal_column("'approved'"),
+            Listing.is_hidden == False
+        ]
+        if category:
+            conditions.append(Listing.category == category)
         
-        filters_str = json.dumps(filters, sort_keys=True, ensure_ascii=False)
-        return hashlib.md5(filters_str.encode()).hexdigest()[:8]
+        # Apply filters
+        if filters and category == "restaurants":
+            sub_slug = filters.get('sub_slug')
+            if sub_slug and sub_slug != 'all':
+                conditions.append(Listing.sub_slug == sub_slug)
+        if filters:
+            if filters.get('district'):
+                conditions.append(Listing.district == filters['district'])
+            if filters.get('has_phone'):
+                conditions.append(HAS_PHONE)
+            if filters.get('has_location'):
+                conditions.append(HAS_LOCATION)
+            if filters.get('min_priority'):
+                conditions.append(Listing.priority_level >= filters['min_priority'])
+        
+        return conditions
+    
+    async def _catalog_generation(self, city_id: int, category: str) -> Tuple[int, int]:
+        """Current (city, category) catalog generation."""
+        cache = await self._get_cache()
+        return await cache.get_catalog_generation(city_id, category)
+    
+    async def _with_session(self, loader, *args) -> Any:
+        """Run loader with its own DB session (for background refreshes)."""
+        from app.db.database import AsyncSessionLocal
+        async with AsyncSessionLocal() as db:
+            return await loader(db, *args)
+    
+    def _row_to_item(self, row: Any) -> Dict:
+        """Convert projected listing row to catalog item dict."""
+        return {
+            'id': row.id,
+            'name': row.name,
+            'description': row.description,
+            'address': row.address,
+            'district': row.district,
+            'phone': row.phone,
+            'gmaps_url': row.gmaps_url,
+            'brand_logo_url': row.brand_logo_url,
+            'category': row.category,
+            'sub_slug': row.sub_slug,
+            'partner_id': row.partner_profile_id,
+            'user_id': row.user_id
+        }
+    
+    def build_page_query(
+        self,
+        city_id: int,
+        category: str,
+        page: int = 1,
+        per_page: int = 5,
+        filters: Optional[Dict] = None,
+        exact_total: bool = True,
+        pages: int = 1
+    ):
+        """
+        Build offset catalog query for `pages` consecutive pages starting at
+        `page` (also used for EXPLAIN checks).
+        """
+        conditions = self._catalog_conditions(city_id, category, filters)
+        
+        if exact_total:
+            # Window count is evaluated before OFFSET/LIMIT, so it sees every match
+            query = select(*CATALOG_COLUMNS, func.count().over().label('total_count'))
+            limit = per_page * pages
+        else:
+            query = select(*CATALOG_COLUMNS)
+            limit = per_page * pages + 1
+        
+        return query.where(and_(*conditions)).order_by(
+            SORT_PRIORITY.desc(),
+            SORT_CREATED_AT.desc(),
+            Listing.id.desc()
+        ).offset((page - 1) * per_page).limit(limit)
     
     async def get_page(
         self,
@@ -38,138 +251,856 @@ class CatalogService:
         category: str,
         page: int = 1,
         per_page: int = 5,
-        filters: Optional[Dict] = None
-    ) -> Tuple[List[Dict], int, int, int]:
+        filters: Optional[Dict] = None,
+        exact_total: bool = True
+    ) -> Tuple[List[Dict], Optional[int], int, int]:
         """
         Get paginated catalog with caching.
+        
+        Page rows and the total come back from a single statement using
+        count(*) OVER (). With exact_total=False the count is skipped entirely:
+        one extra row is fetched to detect a next page, total_count is None and
+        total_pages is page + 1 while more rows exist.
         Returns: (items, total_count, current_page, total_pages)
         """
+        if self.snapshots is not None:
+            await self._ensure_cities()
+            result_data = self.snapshots.page(city_id, category, page, per_page, filters, exact_total)
+            if result_data is not None:
+                return (
+                    result_data['items'],
+                    result_data['total_count'],
+                    result_data['current_page'],
+                    result_data['total_pages']
+                )
+        
         cache = await self._get_cache()
-        filters_hash = self._make_filters_hash(filters)
-        cache_key = f"catalog:{city_id}:{category}:{page}:{filters_hash}"
-        
-        # Try cache first
-        cached_result = await cache.get(cache_key)
-        if cached_result:
-            return (
-                cached_result['items'],
-                cached_result['total_count'],
-                cached_result['current_page'],
-                cached_result['total_pages']
-            )
+        cache_key = await self._page_key(cache, city_id, category, page, per_page, filters, exact_total)
         
-        # Build query
-        query = select(Listing).where(
-            and_(
-                Listing.city_id == city_id,
-                Listing.category == category,
-                Listing.moderation_status == 'approved',
-                Listing.is_hidden == False
-            )
-        ).options(
-            selectinload(Listing.city),
-            selectinload(Listing.partner_profile)
-        ).order_by(
-            Listing.priority_level.desc(),
-            Listing.created_at.desc()
+        # Concurrent misses for the same page share one query, which also
+        # fills the following CATALOG_PREFETCH_PAGES - 1 pages
+        load_args = (city_id, category, page, per_page, filters, exact_total, CATALOG_PREFETCH_PAGES)
+        result_data = await cache.get_or_compute(
+            cache_key,
+            lambda: self._load_page(db, *load_args),
+            ttl=CATALOG_TTL + CATALOG_STALE_TTL,
+            lock=True,
+            soft_ttl=CATALOG_TTL,
+            refresh=lambda: self._with_session(self._load_page, *load_args)
         )
         
-        # Apply filters
-        if filters and category == "restaurants":
-            sub_slug = filters.get('sub_slug')
-            if sub_slug and sub_slug != 'all':
-                query = query.where(Listing.sub_slug == sub_slug)
-        
-        # Get total count
-        count_query = select(func.count(Listing.id)).where(
-            and_(
-                Listing.city_id == city_id,
-                Listing.category == category,
-                Listing.moderation_status == 'approved',
-                Listing.is_hidden == False
-            )
+        return (
+            result_data['items'],
+            result_data['total_count'],
+            result_data['current_page'],
+            result_data['total_pages']
         )
+    
+    async def _load_page(
+        self,
+        db: AsyncSession,
+        city_id: int,
+        category: str,
+        page: int,
+        per_page: int,
+        filters: Optional[Dict],
+        exact_total: bool,
+        prefetch: int = 1
+    ) -> Dict:
+        """
+        Load offset catalog page from the database.
+        Up to `prefetch` pages are read in one query; pages after the
+        requested one are written to the cache in one pipelined call.
+        """
+        conditions = self._catalog_conditions(city_id, category, filters)
+        offset = (page - 1) * per_page
+        prefetch = max(prefetch, 1)
+        query = self.build_page_query(city_id, category, page, per_page, filters, exact_total, prefetch)
         
-        if filters and category == "restaurants":
-            sub_slug = filters.get('sub_slug')
-            if sub_slug and sub_slug != 'all':
-                count_query = count_query.where(Listing.sub_slug == sub_slug)
+        # Prefetched pages are keyed by the generation read before the query:
+        # an invalidation racing the query then leaves them unreachable
+        cache = await self._get_cache()
+        generation = await cache.get_catalog_generation(city_id, category) if prefetch > 1 else None
         
-        total_count = await db.scalar(count_query)
-        total_pages = (total_count + per_page - 1) // per_page
+        result = await db.execute(query)
+        rows = result.all()
         
-        # Get paginated results
-        offset = (page - 1) * per_page
-        query = query.offset(offset).limit(per_page)
+        if exact_total:
+            if rows:
+                total_count = rows[0].total_count
+            elif offset:
+                # Page past the end: no row carries the window count
+                count_query = select(func.count(Listing.id)).where(and_(*conditions))
+                total_count = await db.scalar(count_query)
+            else:
+                total_count = 0
+            total_pages = (total_count + per_page - 1) // per_page
+        else:
+            total_count = None
         
-        result = await db.execute(query)
-        listings = result.scalars().all()
-        
-        # Convert to dict format
-        items = []
-        for listing in listings:
-            items.append({
-                'id': listing.id,
-                'name': listing.name,
-                'description': listing.description,
-                'address': listing.address,
-                'district': listing.district,
-                'phone': listing.phone,
-                'gmaps_url': listing.gmaps_url,
-                'brand_logo_url': listing.brand_logo_url,
-                'category': listing.category,
-                'sub_slug': listing.sub_slug,
-                'partner_id': listing.partner_profile_id,
-                'user_id': listing.user_id
+        pages_data = []
+        for index in range(prefetch):
+            chunk = rows[index * per_page:(index + 1) * per_page]
+            if index and not chunk:
+                break
+            
+            current_page = page + index
+            if not exact_total:
+                has_more = len(rows) > (index + 1) * per_page
+                total_pages = current_page + 1 if has_more else current_page
+            
+            # Convert to dict format
+            pages_data.append({
+                'items': [self._row_to_item(row) for row in chunk],
+                'total_count': total_count,
+                'current_page': current_page,
+                'total_pages': total_pages
             })
         
-        # Cache result
-        result_data = {
+        if len(pages_data) > 1:
+            prefetched = {}
+            for data in pages_data[1:]:
+                key = await self._page_key(
+                    cache, city_id, category, data['current_page'], per_page, filters, exact_total, generation
+                )
+                prefetched[key] = data
+            await cache.set_many(prefetched, ttl=CATALOG_TTL + CATALOG_STALE_TTL, soft_ttl=CATALOG_TTL)
+        
+        return pages_data[0]
+    
+    async def _page_key(
+        self,
+        cache,
+        city_id: int,
+        category: str,
+        page: Any,
+        per_page: int,
+        filters: Optional[Dict],
+        exact_total: bool,
+        generation: Optional[Tuple[int, int]] = None
+    ) -> str:
+        """
+        Build cache key for offset page number or keyset token (see make_catalog_key
+        for generation). Page size is part of the key: the bot and the API page differently.
+        """
+        cache_key = await cache.make_catalog_key(city_id, category, page, filters, generation)
+        cache_key += f":n{per_page}"
+        if not exact_total:
+            cache_key += ":est"
+        return cache_key
+    
+    async def get_page_by_cursor(
+        self,
+        db: AsyncSession,
+        city_id: int,
+        category: str,
+        cursor: Optional[str] = None,
+        per_page: int = 5,
+        filters: Optional[Dict] = None,
+        exact_total: bool = True
+    ) -> Tuple[List[Dict], Optional[int], Optional[str], Optional[str]]:
+        """
+        Get catalog page using keyset (seek) pagination.
+        
+        Rows are located with a range scan on (priority_level, created_at, id)
+        (NULLs sorted as the cursor encodes them, see SORT_PRIORITY)
+        starting after the cursor, so deep pages cost the same as the first one.
+        The total is computed in the same statement via a scalar subquery, or
+        skipped (total_count is None) with exact_total=False.
+        Returns: (items, total_count, next_cursor, prev_cursor)
+        """
+        if cursor:
+            # Reject malformed cursors before touching cache or database
+            decode_cursor(cursor)
+        
+        if self.snapshots is not None:
+            await self._ensure_cities()
+            result_data = self.snapshots.page_by_cursor(city_id, category, cursor, per_page, filters, exact_total)
+            if result_data is not None:
+                return (
+                    result_data['items'],
+                    result_data['total_count'],
+                    result_data['next_cursor'],
+                    result_data['prev_cursor']
+                )
+        
+        cache = await self._get_cache()
+        cache_key = await self._page_key(cache, city_id, category, f"c{cursor or ''}", per_page, filters, exact_total)
+        
+        load_args = (city_id, category, cursor, per_page, filters, exact_total, CATALOG_PREFETCH_PAGES)
+        result_data = await cache.get_or_compute(
+            cache_key,
+            lambda: self._load_page_by_cursor(db, *load_args),
+            ttl=CATALOG_TTL + CATALOG_STALE_TTL,
+            lock=True,
+            soft_ttl=CATALOG_TTL,
+            refresh=lambda: self._with_session(self._load_page_by_cursor, *load_args)
+        )
+        
+        return (
+            result_data['items'],
+            result_data['total_count'],
+            result_data['next_cursor'],
+            result_data['prev_cursor']
+        )
+    
+    async def preload_view(
+        self,
+        city_id: int,
+        category: str,
+        cursor: Optional[str] = None,
+        per_page: int = 5,
+        filters: Optional[Dict] = None,
+        exact_total: bool = True
+    ):
+        """
+        Read the cached keyset page and facet counts of one catalog view with
+        a single MGET into L1, so the get_page_by_cursor and get_facets calls
+        that follow don't make a GET each. Misses are left to those calls.
+        """
+        cache = await self._get_cache()
+        if cache.l1 is None:
+            return
+        
+        await cache.get_many([
+            await self._page_key(cache, city_id, category, f"c{cursor or ''}", per_page, filters, exact_total),
+            await cache.make_catalog_key(city_id, category, "facets")
+        ])
+    
+    def build_cursor_query(
+        self,
+        city_id: int,
+        category: str,
+        cursor: Optional[str] = None,
+        per_page: int = 5,
+        filters: Optional[Dict] = None,
+        exact_total: bool = True,
+        pages: int = 1
+    ):
+        """
+        Build keyset catalog query for `pages` pages after cursor (one page
+        before it for backward cursors), plus one extra row to detect a next
+        page (also used for EXPLAIN checks).
+        """
+        backward = False
+        seek_key = None
+        if cursor:
+            backward, priority_level, created_at, listing_id = decode_cursor(cursor)
+            seek_key = tuple_(priority_level, created_at, listing_id)
+        
+        conditions = self._catalog_conditions(city_id, category, filters)
+        sort_key = tuple_(SORT_PRIORITY, SORT_CREATED_AT, Listing.id)
+        
+        if exact_total:
+            # Seek predicate must not limit the total, so count in a subquery
+            total_column = select(func.count(Listing.id)).where(and_(*conditions)).scalar_subquery()
+            query = select(*CATALOG_COLUMNS, total_column.label('total_count'))
+        else:
+            query = select(*CATALOG_COLUMNS)
+        
+        query = query.where(and_(*conditions))
+        if backward:
+            query = query.where(sort_key > seek_key).order_by(
+                SORT_PRIORITY.asc(),
+                SORT_CREATED_AT.asc(),
+                Listing.id.asc()
+            )
+            pages = 1
+        else:
+            if seek_key is not None:
+                query = query.where(sort_key < seek_key)
+            query = query.order_by(
+                SORT_PRIORITY.desc(),
+                SORT_CREATED_AT.desc(),
+                Listing.id.desc()
+            )
+        
+        return query.limit(per_page * pages + 1)
+    
+    async def _load_page_by_cursor(
+        self,
+        db: AsyncSession,
+        city_id: int,
+        category: str,
+        cursor: Optional[str],
+        per_page: int,
+        filters: Optional[Dict],
+        exact_total: bool,
+        prefetch: int = 1
+    ) -> Dict:
+        """
+        Load keyset catalog page from the database.
+        Moving forward, up to `prefetch` pages are read in one query and the
+        following pages are cached under the cursors their "next" links use.
+        """
+        backward = decode_cursor(cursor)[0] if cursor else False
+        conditions = self._catalog_conditions(city_id, category, filters)
+        
+        # Backward pages are not prefetched: their cursors come from the page after
+        prefetch = 1 if backward else max(prefetch, 1)
+        query = self.build_cursor_query(city_id, category, cursor, per_page, filters, exact_total, prefetch)
+        
+        # Prefetched pages are keyed by the generation read before the query (see _load_page)
+        cache = await self._get_cache()
+        generation = await cache.get_catalog_generation(city_id, category) if prefetch > 1 else None
+        
+        result = await db.execute(query)
+        rows = result.all()
+        has_more = len(rows) > per_page
+        listings = rows[:per_page]
+        if backward:
+            listings.reverse()
+        
+        if not exact_total:
+            total_count = None
+        elif rows:
+            total_count = rows[0].total_count
+        else:
+            count_query = select(func.count(Listing.id)).where(and_(*conditions))
+            total_count = await db.scalar(count_query)
+        
+        next_cursor = None
+        prev_cursor = None
+        if listings:
+            first, last = listings[0], listings[-1]
+            if has_more or backward:
+                next_cursor = encode_cursor(last.priority_level, last.created_at, last.id)
+            if (has_more and backward) or (cursor and not backward):
+                prev_cursor = encode_cursor(first.priority_level, first.created_at, first.id, backward=True)
+        
+        items = [self._row_to_item(row) for row in listings]
+        
+        # Following pages, keyed by the cursor that leads to each of them
+        prefetched = {}
+        page_cursor = next_cursor
+        for index in range(1, prefetch):
+            chunk = rows[index * per_page:(index + 1) * per_page]
+            if not chunk or not page_cursor:
+                break
+            
+            first, last = chunk[0], chunk[-1]
+            chunk_next = None
+            if len(rows) > (index + 1) * per_page:
+                chunk_next = encode_cursor(last.priority_level, last.created_at, last.id)
+            
+            key = await self._page_key(
+                cache, city_id, category, f"c{page_cursor}", per_page, filters, exact_total, generation
+            )
+            prefetched[key] = {
+                'items': [self._row_to_item(row) for row in chunk],
+                'total_count': total_count,
+                'next_cursor': chunk_next,
+                'prev_cursor': encode_cursor(first.priority_level, first.created_at, first.id, backward=True)
+            }
+            page_cursor = chunk_next
+        
+        if prefetched:
+            await cache.set_many(prefetched, ttl=CATALOG_TTL + CATALOG_STALE_TTL, soft_ttl=CATALOG_TTL)
+        
+        return {
             'items': items,
             'total_count': total_count,
-            'current_page': page,
-            'total_pages': total_pages
+            'next_cursor': next_cursor,
+            'prev_cursor': prev_cursor
+        }
+    
+    def build_facets_query(self, city_id: int, category: str):
+        """
+        Build grouped query counting listings per combination of facet values;
+        every facet count under any filter selection is a sum over its rows.
+        """
+        priority = func.coalesce(Listing.priority_level, 0)
+        return select(
+            Listing.district,
+            Listing.sub_slug,
+            HAS_PHONE.label('has_phone'),
+            HAS_LOCATION.label('has_location'),
+            priority.label('priority'),
+            func.count().label('listings')
+        ).where(
+            and_(*self._catalog_conditions(city_id, category))
+        ).group_by(
+            Listing.district,
+            Listing.sub_slug,
+            HAS_PHONE,
+            HAS_LOCATION,
+            priority
+        )
+    
+    async def _load_facet_rows(self, db: AsyncSession, city_id: int, category: str) -> List[List[Any]]:
+        """Load facet combination counts as [district, sub_slug, has_phone, has_location, priority, listings]."""
+        result = await db.execute(self.build_facets_query(city_id, category))
+        return [list(row) for row in result.all()]
+    
+    async def get_facets(
+        self,
+        db: AsyncSession,
+        city_id: int,
+        category: str,
+        filters: Optional[Dict] = None
+    ) -> Dict[str, Any]:
+        """
+        Facet counts for catalog filter menus.
+        
+        One grouped query per city/category is cached under the catalog
+        generation (so listing changes invalidate it like pages); counts for
+        any filter selection are then summed in memory. Each facet is counted
+        under every selected filter except its own, so menus show what picking
+        another option would return; sub_slug_total is the count for "all"
+        sub-categories under the other filters.
+        Returns: {'total': n, 'district': {name: n}, 'sub_slug': {slug: n},
+        'sub_slug_total': n, 'has_phone': n, 'has_location': n, 'priority': {level: n}}
+        """
+        cache = await self._get_cache()
+        cache_key = await cache.make_catalog_key(city_id, category, "facets")
+        rows = await cache.get_or_compute(
+            cache_key,
+            lambda: self._load_facet_rows(db, city_id, category),
+            ttl=CATALOG_TTL + CATALOG_STALE_TTL,
+            lock=True,
+            soft_ttl=CATALOG_TTL,
+            refresh=lambda: self._with_session(self._load_facet_rows, city_id, category)
+        )
+        
+        filters = filters or {}
+        sub_slug = filters.get('sub_slug') if category == "restaurants" else None
+        checks = {
+            'district': lambda row: not filters.get('district') or row[0] == filters['district'],
+            'sub_slug': lambda row: not sub_slug or sub_slug == 'all' or row[1] == sub_slug,
+            'has_phone': lambda row: not filters.get('has_phone') or row[2],
+            'has_location': lambda row: not filters.get('has_location') or row[3],
+            'priority': lambda row: not filters.get('min_priority') or row[4] >= filters['min_priority']
+        }
+        
+        facets: Dict[str, Any] = {
+            'total': 0,
+            'district': {},
+            'sub_slug': {},
+            'sub_slug_total': 0,
+            'has_phone': 0,
+            'has_location': 0,
+            'priority': {}
         }
+        for row in rows:
+            listings = row[-1]
+            failed = [name for name, check in checks.items() if not check(row)]
+            if not failed:
+                facets['total'] += listings
+            if not failed or failed == ['sub_slug']:
+                facets['sub_slug_total'] += listings
+            for name, value in zip(FACET_NAMES, row):
+                # Row counts for this facet if it matches every other filter
+                if failed and failed != [name]:
+                    continue
+                if name in ('has_phone', 'has_location'):
+                    if value:
+                        facets[name] += listings
+                elif value is not None:
+                    facets[name][value] = facets[name].get(value, 0) + listings
+        
+        return facets
+    
+    def build_search_query(
+        self,
+        city_id: int,
+        query: str,
+        category: Optional[str] = None,
+        limit: int = 20,
+        offset: int = 0
+    ):
+        """
+        Build ranked search query: full-text match on search_vector in every
+        SEARCH_CONFIGS language, or trigram match on name for typos.
+        """
+        ts_query = None
+        for config in SEARCH_CONFIGS:
+            part = func.websearch_to_tsquery(literal_column(f"'{config}'::regconfig"), query)
+            ts_query = part if ts_query is None else ts_query.op('||')(part)
+        
+        rank = func.ts_rank_cd(Listing.search_vector, ts_query) + func.similarity(Listing.name, query)
+        conditions = self._catalog_conditions(city_id, category)
+        conditions.append(or_(
+            Listing.search_vector.op('@@')(ts_query),
+            Listing.name.op('%')(query)
+        ))
         
-        await cache.set(cache_key, result_data, ttl=300)  # 5 minutes
+        return select(*CATALOG_COLUMNS, func.count().over().label('total_count')).where(
+            and_(*conditions)
+        ).order_by(
+            rank.desc(),
+            SORT_PRIORITY.desc(),
+            Listing.id.desc()
+        ).offset(offset).limit(limit)
+    
+    async def search(
+        self,
+        db: AsyncSession,
+        city_id: int,
+        query: str,
+        category: Optional[str] = None,
+        limit: int = 20,
+        offset: int = 0
+    ) -> Tuple[List[Dict], int]:
+        """
+        Search approved, visible listings of a city, best matches first.
+        Returns: (items, total_count); queries shorter than SEARCH_MIN_LENGTH match nothing.
+        """
+        query = " ".join(query.split())[:SEARCH_MAX_LENGTH]
+        if len(query) < SEARCH_MIN_LENGTH:
+            return [], 0
         
-        return items, total_count, page, total_pages
+        result = await db.execute(self.build_search_query(city_id, query, category, limit, offset))
+        rows = result.all()
+        total_count = rows[0].total_count if rows else 0
+        return [self._row_to_item(row) for row in rows], total_count
+    
+    async def suggest(self, city_id: int, query: str, limit: int = 10) -> List[Dict]:
+        """Autocomplete listing names and districts of city from the in-memory index."""
+        await self._ensure_cities()
+        return await self.suggestions.suggest(city_id, query[:SEARCH_MAX_LENGTH], limit)
     
     async def get_listing(self, db: AsyncSession, listing_id: int) -> Optional[Dict]:
-        """Get single listing by ID."""
-        query = select(Listing).where(Listing.id == listing_id).options(
-            selectinload(Listing.city),
-            selectinload(Listing.partner_profile)
+        """Get single listing by ID with caching."""
+        if self.snapshots is not None:
+            item = self.snapshots.listing(listing_id)
+            if item is not None:
+                return item
+        
+        cache = await self._get_cache()
+        cache_key = cache.make_listing_key(listing_id)
+        
+        return await cache.get_or_compute(
+            cache_key,
+            lambda: self._load_listing(db, listing_id),
+            ttl=LISTING_TTL
         )
+    
+    async def get_listings_by_ids(self, db: AsyncSession, listing_ids: List[int]) -> List[Dict]:
+        """
+        Get listing cards for many ids, in requested order (unknown ids are left out).
+        Cards come from snapshots, then one cache multi-get, then one
+        WHERE id = ANY(:ids) query for the rest, which is cached back in one
+        pipelined call.
+        """
+        listing_ids = list(dict.fromkeys(listing_ids))
+        if len(listing_ids) > CATALOG_BATCH_MAX:
+            raise ValueError(f"At most {CATALOG_BATCH_MAX} ids per request")
         
-        result = await db.execute(query)
-        listing = result.scalar_one_or_none()
+        found: Dict[int, Dict] = {}
+        if self.snapshots is not None:
+            for listing_id in listing_ids:
+                item = self.snapshots.listing(listing_id)
+                if item is not None:
+                    found[listing_id] = item
+        
+        cache = await self._get_cache()
+        keys = {cache.make_listing_key(listing_id): listing_id for listing_id in listing_ids if listing_id not in found}
+        if keys:
+            cached = await cache.get_many(list(keys))
+            for key, item in cached.items():
+                if item is not None:
+                    found[keys[key]] = item
+        
+        missing = [listing_id for listing_id in listing_ids if listing_id not in found]
+        if missing:
+            query = self._card_query().where(Listing.id == any_(bindparam('ids', missing, type_=ARRAY(Integer))))
+            result = await db.execute(query)
+            loaded = {row.id: self._row_to_card(row) for row in result.all()}
+            if loaded:
+                await cache.set_many(
+                    {cache.make_listing_key(listing_id): item for listing_id, item in loaded.items()},
+                    ttl=LISTING_TTL
+                )
+            found.update(loaded)
+        
+        return [found[listing_id] for listing_id in listing_ids if listing_id in found]
+    
+    def _card_query(self):
+        """Columns of a listing card, including its city name."""
+        return select(
+            *CATALOG_COLUMNS,
+            Listing.moderation_status,
+            Listing.is_hidden,
+            City.name_ru.label('city_name')
+        ).outerjoin(City, City.id == Listing.city_id)
+    
+    def _row_to_card(self, row: Any) -> Dict:
+        """Convert card row to listing card dict."""
+        item = self._row_to_item(row)
+        item.update({
+            'moderation_status': row.moderation_status,
+            'is_hidden': row.is_hidden,
+            'city': row.city_name
+        })
+        return item
+    
+    async def _load_listing(self, db: AsyncSession, listing_id: int) -> Optional[Dict]:
+        """Load single listing from the database."""
+        result = await db.execute(self._card_query().where(Listing.id == listing_id))
+        row = result.first()
         
-        if not listing:
+        if not row:
             return None
         
-        return {
-            'id': listing.id,
-            'name': listing.name,
-            'description': listing.description,
-            'address': listing.address,
-            'district': listing.district,
-            'phone': listing.phone,
-            'gmaps_url': listing.gmaps_url,
-            'brand_logo_url': listing.brand_logo_url,
-            'category': listing.category,
-            'sub_slug': listing.sub_slug,
-            'moderation_status': listing.moderation_status,
-            'is_hidden': listing.is_hidden,
-            'partner_id': listing.partner_profile_id,
-            'user_id': listing.user_id,
-            'city': listing.city.name if listing.city else None
-        }
+        return self._row_to_card(row)
+    
+    async def catalog_etag(self, city_id: int, category: str, variant: str) -> Optional[str]:
+        """
+        ETag of a catalog response, known before the page is read: the
+        city/category generation changes on every catalog write. Pages can
+        also change by TTL refresh within one generation, so the tag rolls
+        over every CATALOG_TTL seconds too. None while Redis is unreachable
+        or its circuit is open (generations unknown).
+        """
+        cache = await self._get_cache()
+        if not cache._available():
+            return None
+        
+        city_gen, category_gen = await cache.get_catalog_generation(city_id, category)
+        period = int(time.time() // CATALOG_TTL)
+        digest = hashlib.md5(variant.encode()).hexdigest()[:12]
+        return f'W/"c{city_id}-{category}-g{city_gen}.{category_gen}-{period}-{digest}"'
+    
+    def listing_etag(self, item: Dict) -> str:
+        """ETag of a listing card (content hash: cards also embed the city name)."""
+        digest = hashlib.md5(json.dumps(item, sort_keys=True, default=str).encode()).hexdigest()[:16]
+        return f'W/"l{item["id"]}-{digest}"'
+    
+    async def invalidate_cache(
+        self,
+        city_id: int,
+        category: Optional[str] = None,
+        listing_ids: Optional[List[int]] = None
+    ):
+        """
+        Invalidate catalog cache for city (or a single category in it) and
+        delete cached cards of the changed listing_ids, so edits show up
+        without the DB change listener. Without listing_ids every card in
+        the city (or category) is deleted.
+        """
+        self.invalidate_snapshot(city_id, category)
+        cache = await self._get_cache()
+        await cache.invalidate_city_cache(city_id, category)
+        
+        if listing_ids is None:
+            listing_ids = await self.get_city_listing_ids([city_id], category)
+        await cache.delete_many([cache.make_listing_key(listing_id) for listing_id in listing_ids])
+    
+    def invalidate_snapshot(self, city_id: int, category: Optional[str] = None):
+        """Reload in-memory snapshot (when enabled) and suggest index of city (or category)."""
+        if self.snapshots is not None:
+            self.snapshots.invalidate(city_id, category)
+        self.suggestions.invalidate(city_id)
+    
+    async def refresh_snapshot_listings(self, listing_ids: List[int]):
+        """Apply changed listings to in-memory snapshots and suggest index (one query each)."""
+        if not listing_ids:
+            return
+        
+        from app.db.database import AsyncSessionLocal
+        async with AsyncSessionLocal() as db:
+            if self.snapshots is not None:
+                await self.snapshots.refresh_listings(db, listing_ids)
+            await self.suggestions.refresh_listings(db, listing_ids)
+    
+    async def get_city_listing_ids(self, city_ids: List[int], category: Optional[str] = None) -> List[int]:
+        """Ids of all listings in cities, or in one category of them (for dropping their cached cards)."""
+        from app.db.database import AsyncSessionLocal
+        query = select(Listing.id).where(Listing.city_id.in_(city_ids))
+        if category:
+            query = query.where(Listing.category == category)
+        async with AsyncSessionLocal() as db:
+            result = await db.execute(query)
+            return list(result.scalars().all())
+    
+    async def load_active_cities(self) -> List[int]:
+        """
+        Read ids of active cities and limit in-memory snapshots and suggest
+        indexes to them. Called by the full warm-up, on city changes and
+        lazily by _ensure_cities.
+        """
+        from app.db.database import AsyncSessionLocal
+        async with AsyncSessionLocal() as db:
+            result = await db.execute(select(City.id).where(City.is_active == True))
+            city_ids = list(result.scalars().all())
+        
+        if self.snapshots is not None:
+            self.snapshots.set_cities(city_ids)
+        self.suggestions.set_cities(city_ids)
+        self._cities_loaded_at = time.monotonic()
+        return city_ids
+    
+    async def _ensure_cities(self):
+        """
+        Load active cities on first use in any process (API, bot or combined)
+        and re-read them every CATALOG_CITIES_TTL seconds in the background.
+        A failed read is retried after CATALOG_CITIES_RETRY seconds.
+        """
+        now = time.monotonic()
+        if self._cities_loaded_at is not None and now - self._cities_loaded_at < CATALOG_CITIES_TTL:
+            return
+        if now < self._cities_retry_at:
+            return
+        
+        if self._cities_task is None or self._cities_task.done():
+            self._cities_task = asyncio.create_task(self._refresh_cities())
+        if self._cities_loaded_at is None:
+            # Nothing to answer from yet: wait (shielded, the load is shared by concurrent callers)
+            await asyncio.shield(self._cities_task)
+    
+    async def _refresh_cities(self):
+        """Background load_active_cities that schedules a retry instead of raising."""
+        try:
+            await self.load_active_cities()
+        except Exception as e:
+            self._cities_retry_at = time.monotonic() + CATALOG_CITIES_RETRY
+            logger.error(f"Cannot load active cities, retrying in {CATALOG_CITIES_RETRY}s: {e}")
+    
+    def _warm_up_targets(self, categories: Optional[List[str]] = None) -> List[Tuple[str, Optional[Dict]]]:
+        """List (category, filters) combinations shown by the bot."""
+        targets = []
+        for category in categories or [c.value for c in Category]:
+            targets.append((category, None))
+            if category == Category.RESTAURANTS.value:
+                targets.extend((category, {"sub_slug": sub_slug}) for sub_slug in RESTAURANT_SUB_SLUGS)
+        return targets
     
-    async def invalidate_cache(self, city_id: int):
-        """Invalidate catalog cache for city."""
+    async def _warm_target(
+        self,
+        db: AsyncSession,
+        city_id: int,
+        category: str,
+        filters: Optional[Dict],
+        pages: int
+    ) -> int:
+        """Walk the first pages of one target through the cursor chain the bot uses."""
+        cursor = None
+        warmed = 0
+        for _ in range(pages):
+            _, _, cursor, _ = await self.get_page_by_cursor(
+                db, city_id, category, cursor, per_page=CATALOG_WARMUP_PER_PAGE, filters=filters
+            )
+            warmed += 1
+            if not cursor:
+                break
+        return warmed
+    
+    async def warm_up(
+        self,
+        city_ids: Optional[List[int]] = None,
+        categories: Optional[List[str]] = None,
+        pages: Optional[int] = None,
+        concurrency: Optional[int] = None
+    ) -> int:
+        """
+        Precompute the first catalog pages for every active city, category
+        and restaurant sub_slug. Each target uses its own session and at most
+        `concurrency` run at once so the DB pool is not exhausted.
+        Returns number of pages warmed.
+        """
+        pages = CATALOG_WARMUP_PAGES if pages is None else pages
+        concurrency = concurrency or CATALOG_WARMUP_CONCURRENCY
+        
+        if city_ids is None:
+            try:
+                city_ids = await self.load_active_cities()
+            except Exception as e:
+                logger.error(f"Catalog warm-up skipped, cannot load cities: {e}")
+                return 0
+        
+        if pages <= 0:
+            return 0
+        
+        # One MGET for all first pages; targets already cached are skipped
         cache = await self._get_cache()
-        await cache.invalidate_city_cache(city_id)
+        targets = {}
+        for city_id in city_ids:
+            for category, filters in self._warm_up_targets(categories):
+                key = await self._page_key(cache, city_id, category, "c", CATALOG_WARMUP_PER_PAGE, filters, True)
+                targets[key] = (city_id, category, filters)
+        cached = await cache.get_many(list(targets))
+        
+        semaphore = asyncio.Semaphore(concurrency)
+        
+        if self.snapshots is not None:
+            await self._warm_snapshots(city_ids, semaphore)
+        
+        async def warm(city_id: int, category: str, filters: Optional[Dict]) -> int:
+            async with semaphore:
+                try:
+                    return await self._with_session(self._warm_target, city_id, category, filters, pages)
+                except Exception as e:
+                    logger.error(f"Catalog warm-up error for city {city_id} {category}: {e}")
+                    return 0
+        
+        results = await asyncio.gather(*(
+            warm(city_id, category, filters)
+            for key, (city_id, category, filters) in targets.items()
+            if key not in cached
+        ))
+        warmed = sum(results)
+        logger.info(
+            f"Catalog warm-up done: {warmed} pages for {len(city_ids)} cities, "
+            f"{len(cached)} targets already cached"
+        )
+        return warmed
+    
+    async def _warm_snapshots(self, city_ids: List[int], semaphore: asyncio.Semaphore):
+        """
+        Load in-memory snapshots of cities not in memory yet. A fresh process
+        starts from CATALOG_SNAPSHOT_FILE and reloads only categories whose
+        generation moved since the file was written; remaining cities come
+        from the DB, after which the file is rewritten.
+        """
+        from app.core.services.catalog_snapshot import write_snapshot_file
+        
+        if CATALOG_SNAPSHOT_FILE and not any(self.snapshots.has_city(city_id) for city_id in city_ids):
+            stored = self.snapshots.load_file(CATALOG_SNAPSHOT_FILE)
+            for city_id, generations in stored.items():
+                for category, generation in generations.items():
+                    current = tuple(await self._catalog_generation(city_id, category))
+                    # (0, 0) is also what an unreachable Redis reports; such data cannot be trusted
+                    if current != generation or current == (0, 0):
+                        self.snapshots.invalidate(city_id, category)
+        
+        missing = [
+            city_id for city_id in city_ids
+            if self.snapshots.is_known(city_id) and not self.snapshots.has_city(city_id)
+        ]
+        
+        async def load(city_id: int):
+            async with semaphore:
+                try:
+                    await self._with_session(self.snapshots.load_city, city_id)
+                except Exception as e:
+                    logger.error(f"Catalog snapshot warm-up error for city {city_id}: {e}")
+        
+        await asyncio.gather(*(load(city_id) for city_id in missing))
+        
+        if CATALOG_SNAPSHOT_FILE and missing:
+            try:
+                await asyncio.to_thread(write_snapshot_file, CATALOG_SNAPSHOT_FILE, self.snapshots.serialize())
+            except OSError as e:
+                logger.error(f"Cannot write catalog snapshot file {CATALOG_SNAPSHOT_FILE}: {e}")
+    
+    def schedule_warm_up(self, city_id: int, category: Optional[str] = None, delay: float = 1.0):
+        """
+        Re-warm a city (or city category) after invalidation in the background.
+        Bursts of invalidations within `delay` seconds collapse into one run.
+        """
+        key = (city_id, category)
+        task = self._warmup_tasks.get(key)
+        if task is not None and not task.done():
+            return
+        
+        async def run():
+            try:
+                await asyncio.sleep(delay)
+                await self.warm_up([city_id], [category] if category else None)
+            finally:
+                self._warmup_tasks.pop(key, None)
+        
+        self._warmup_tasks[key] = asyncio.create_task(run())
 
 # Global service instance
 catalog_service = CatalogService()
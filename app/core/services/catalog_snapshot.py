@@ -0,0 +1,634 @@
+"""
+In-memory catalog snapshot engine for Karma System.
+"""
+import asyncio
+import bisect
+import json
+import logging
+import mmap
+import os
+import struct
+import sys
+import time
+from array import array
+from collections.abc import MutableMapping
+from datetime import timedelta
+from types import SimpleNamespace
+from typing import Any, Awaitable, Callable, Dict, Iterator, List, Optional, Sequence, Set, Tuple, Union
+
+from sqlalchemy import select, and_, literal_column, any_, bindparam, Integer
+from sqlalchemy.dialects.postgresql import ARRAY
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.db.models import Listing, City, Category
+from app.core.services.catalog_service import (
+    CATALOG_COLUMNS, CATALOG_FILTER_KEYS, _EPOCH, decode_cursor, encode_cursor
+)
+
+logger = logging.getLogger(__name__)
+
+# Attribute names of projected catalog rows
+_ROW_FIELDS = tuple(column.key for column in CATALOG_COLUMNS)
+
+# Index key: (category, sub_slug); sub_slug None indexes the whole category
+IndexKey = Tuple[str, Optional[str]]
+
+# Snapshot file: header, JSON directory, then one block per city. A block is
+# a header, JSON metadata (city name, index keys and lengths), one
+# little-endian int64 array per integer column (rows in catalog order), the
+# row offsets into the text section, the id array of every index and one
+# JSON array of text columns per row. Loading maps the arrays in place and
+# decodes a row only when it is first read.
+SNAPSHOT_FILE_MAGIC = b"KCSN"
+SNAPSHOT_FILE_VERSION = 2
+_FILE_HEADER = struct.Struct("<4sHdI")  # magic, format version, written_at, directory length
+_BLOCK_HEADER = struct.Struct("<III")  # row count, metadata length, text section length
+_INT_FIELDS = ("id", "priority_level", "partner_profile_id", "user_id", "created_at")
+_TEXT_FIELDS = tuple(field for field in _ROW_FIELDS if field not in _INT_FIELDS)
+_NULL_INT = -(2 ** 63)
+_MICROSECOND = timedelta(microseconds=1)
+
+class SnapshotRow:
+    """Compact copy of one catalog row (same attributes as a CATALOG_COLUMNS row)."""
+    
+    __slots__ = _ROW_FIELDS + ("city_id", "sort_key")
+    
+    def __init__(self, row: Any, city_id: int):
+        for field in _ROW_FIELDS:
+            setattr(self, field, getattr(row, field))
+        self.city_id = city_id
+        # Ascending order of sort_key == catalog order (priority, created_at, id all DESC)
+        created_us = (self.created_at - _EPOCH) // _MICROSECOND if self.created_at else 0
+        self.sort_key = (-(self.priority_level or 0), -created_us, -self.id)
+
+class FileRows(MutableMapping):
+    """
+    Rows of one city backed by a mapped snapshot file block. Integer columns
+    stay in the map; a row is decoded on first access and kept. Written rows
+    shadow the file and deleted ones are forgotten.
+    """
+    
+    def __init__(self, city_id: int, columns: Dict[str, Sequence[int]], offsets: Sequence[int], text: memoryview):
+        self.city_id = city_id
+        self._columns = columns
+        self._offsets = offsets
+        self._text = text
+        self._positions: Dict[int, int] = {listing_id: position for position, listing_id in enumerate(columns['id'])}
+        self._rows: Dict[int, SnapshotRow] = {}
+    
+    def _decode(self, position: int) -> SnapshotRow:
+        values = {field: self._columns[field][position] for field in _INT_FIELDS}
+        for field, value in values.items():
+            if value == _NULL_INT:
+                values[field] = None
+        if values['created_at'] is not None:
+            values['created_at'] = _EPOCH + values['created_at'] * _MICROSECOND
+        text = self._text[self._offsets[position]:self._offsets[position + 1]]
+        values.update(zip(_TEXT_FIELDS, json.loads(bytes(text))))
+        return SnapshotRow(SimpleNamespace(**values), self.city_id)
+    
+    def sort_key(self, listing_id: int) -> Tuple[int, int, int]:
+        """Sort key read from the integer columns, without decoding the row."""
+        row = self._rows.get(listing_id)
+        if row is not None:
+            return row.sort_key
+        position = self._positions[listing_id]
+        priority_level = self._columns['priority_level'][position]
+        created_us = self._columns['created_at'][position]
+        return (
+            -(0 if priority_level == _NULL_INT else priority_level),
+            -(0 if created_us == _NULL_INT else created_us),
+            -listing_id
+        )
+    
+    def __getitem__(self, listing_id: int) -> SnapshotRow:
+        row = self._rows.get(listing_id)
+        if row is None:
+            row = self._rows[listing_id] = self._decode(self._positions[listing_id])
+        return row
+    
+    def __setitem__(self, listing_id: int, row: SnapshotRow):
+        self._rows[listing_id] = row
+    
+    def __delitem__(self, listing_id: int):
+        found = self._positions.pop(listing_id, None) is not None
+        if self._rows.pop(listing_id, None) is None and not found:
+            raise KeyError(listing_id)
+    
+    def __contains__(self, listing_id: object) -> bool:
+        return listing_id in self._rows or listing_id in self._positions
+    
+    def __iter__(self) -> Iterator[int]:
+        yield from self._positions
+        for listing_id in self._rows:
+            if listing_id not in self._positions:
+                yield listing_id
+    
+    def __len__(self) -> int:
+        return len(self._positions) + sum(1 for listing_id in self._rows if listing_id not in self._positions)
+
+class CitySnapshot:
+    """Approved, visible listings of one city with per-category id arrays in catalog order."""
+    
+    __slots__ = ("city_id", "city_name", "rows", "indexes", "stale", "loaded_at", "generations")
+    
+    def __init__(self, city_id: int, city_name: Optional[str]):
+        self.city_id = city_id
+        self.city_name = city_name
+        # Plain dict for DB loads, FileRows for cities read from the snapshot file
+        self.rows: Union[Dict[int, SnapshotRow], FileRows] = {}
+        # array("q"), or a read-only view into the snapshot file until first modified
+        self.indexes: Dict[IndexKey, Sequence[int]] = {}
+        # Categories whose data is known to be outdated ("*" = whole city)
+        self.stale: Set[str] = set()
+        self.loaded_at = time.monotonic()
+        # Catalog generations per category read before the rows were loaded
+        self.generations: Dict[str, Tuple[int, int]] = {}
+    
+    def key_of(self, listing_id: int) -> Tuple[int, int, int]:
+        """Sort key of listing, for bisecting id arrays."""
+        if isinstance(self.rows, FileRows):
+            return self.rows.sort_key(listing_id)
+        return self.rows[listing_id].sort_key
+    
+    def _writable(self, key: IndexKey) -> array:
+        """Id array of key, copied out of the snapshot file on first modification."""
+        ids = self.indexes.get(key)
+        if not isinstance(ids, array):
+            ids = self.indexes[key] = array("q", ids if ids is not None else ())
+        return ids
+    
+    def _index_keys(self, row: SnapshotRow) -> List[IndexKey]:
+        keys = [(row.category, None)]
+        if row.sub_slug:
+            keys.append((row.category, row.sub_slug))
+        return keys
+    
+    def replace_category(self, category: Optional[str], rows: List[SnapshotRow]):
+        """Swap all rows of category (or of the whole city) for freshly loaded ones."""
+        if category is None:
+            self.rows = {}
+            self.indexes = {}
+        else:
+            self.rows = {key: row for key, row in self.rows.items() if row.category != category}
+            self.indexes = {key: ids for key, ids in self.indexes.items() if key[0] != category}
+        
+        grouped: Dict[IndexKey, List[SnapshotRow]] = {}
+        for row in rows:
+            self.rows[row.id] = row
+            for key in self._index_keys(row):
+                grouped.setdefault(key, []).append(row)
+        
+        for key, group in grouped.items():
+            group.sort(key=lambda row: row.sort_key)
+            self.indexes[key] = array("q", (row.id for row in group))
+    
+    def remove(self, listing_id: int):
+        """Drop one listing from rows and its id arrays."""
+        row = self.rows.get(listing_id)
+        if row is None:
+            return
+        
+        for key in self._index_keys(row):
+            if key not in self.indexes:
+                continue
+            ids = self._writable(key)
+            position = bisect.bisect_left(ids, row.sort_key, key=self.key_of)
+            if position < len(ids) and ids[position] == listing_id:
+                del ids[position]
+        del self.rows[listing_id]
+    
+    def upsert(self, row: SnapshotRow):
+        """Insert listing (or move it after a sort key change) keeping arrays sorted."""
+        self.remove(row.id)
+        self.rows[row.id] = row
+        for key in self._index_keys(row):
+            ids = self._writable(key)
+            ids.insert(bisect.bisect_left(ids, row.sort_key, key=self.key_of), row.id)
+
+class CatalogSnapshotEngine:
+    """
+    Serves catalog pages and listing cards from per-city in-memory snapshots.
+    
+    Lookups return None whenever the snapshot cannot answer (city not loaded
+    yet, or category invalidated and not reloaded), so the caller falls back
+    to Redis/Postgres. Missing or outdated cities are (re)loaded in the
+    background with their own session; snapshots older than max_age are
+    served while they reload. Only cities passed to set_cities (the active
+    ones) are ever loaded, so arbitrary city ids in requests cannot grow memory.
+    """
+    
+    def __init__(
+        self,
+        to_item: Callable[[Any], Dict],
+        max_age: float = 300.0,
+        generations: Optional[Callable[[int, str], Awaitable[Tuple[int, int]]]] = None
+    ):
+        self.to_item = to_item
+        self.max_age = max_age
+        # Source of catalog generations recorded with each load (CacheService.get_catalog_generation)
+        self.generations = generations
+        self._cities: Dict[int, CitySnapshot] = {}
+        self._listing_city: Dict[int, int] = {}
+        self._loading: Dict[int, asyncio.Task] = {}
+        # Cities invalidated while a load was running, reloaded right after it
+        self._reload: Dict[int, Set[Optional[str]]] = {}
+        # Active cities (set_cities); nothing is loaded until they are known
+        self._known: Set[int] = set()
+    
+    def has_city(self, city_id: int) -> bool:
+        """Whether city is in memory (possibly stale and reloading)."""
+        return city_id in self._cities
+    
+    def is_known(self, city_id: int) -> bool:
+        """Whether city is active and may be loaded."""
+        return city_id in self._known
+    
+    def set_cities(self, city_ids: List[int]):
+        """Replace the set of active cities, dropping snapshots of cities no longer in it."""
+        self._known = set(city_ids)
+        for city_id in [city_id for city_id in self._cities if city_id not in self._known]:
+            snapshot = self._cities.pop(city_id)
+            for listing_id in snapshot.rows:
+                self._listing_city.pop(listing_id, None)
+            logger.info(f"Catalog snapshot for inactive city {city_id} dropped")
+    
+    def _snapshot(self, city_id: int, category: str) -> Optional[CitySnapshot]:
+        """Snapshot able to answer for city category, scheduling loads as needed."""
+        snapshot = self._cities.get(city_id)
+        if snapshot is None:
+            if city_id in self._known:
+                self.schedule_load(city_id)
+            return None
+        
+        if "*" in snapshot.stale or category in snapshot.stale:
+            return None
+        
+        if time.monotonic() - snapshot.loaded_at > self.max_age:
+            self.schedule_load(city_id)
+        return snapshot
+    
+    def _index(self, snapshot: CitySnapshot, category: str, filters: Optional[Dict]) -> Optional[Sequence[int]]:
+        """Id array matching CatalogService._catalog_conditions (None for filters not indexed here)."""
+        if filters and any(filters.get(key) for key in CATALOG_FILTER_KEYS):
+            return None
+        sub_slug = None
+        if filters and category == "restaurants":
+            sub_slug = filters.get('sub_slug')
+            if sub_slug == 'all':
+                sub_slug = None
+        return snapshot.indexes.get((category, sub_slug), array("q"))
+    
+    def page(
+        self,
+        city_id: int,
+        category: str,
+        page: int,
+        per_page: int,
+        filters: Optional[Dict],
+        exact_total: bool
+    ) -> Optional[Dict]:
+        """Offset page in the same shape as CatalogService._load_page."""
+        snapshot = self._snapshot(city_id, category)
+        ids = self._index(snapshot, category, filters) if snapshot else None
+        if ids is None:
+            return None
+        
+        offset = (page - 1) * per_page
+        chunk = ids[offset:offset + per_page]
+        if exact_total:
+            total_count = len(ids)
+            total_pages = (total_count + per_page - 1) // per_page
+        else:
+            total_count = None
+            total_pages = page + 1 if len(ids) > offset + per_page else page
+        
+        return {
+            'items': [self.to_item(snapshot.rows[listing_id]) for listing_id in chunk],
+            'total_count': total_count,
+            'current_page': page,
+            'total_pages': total_pages
+        }
+    
+    def page_by_cursor(
+        self,
+        city_id: int,
+        category: str,
+        cursor: Optional[str],
+        per_page: int,
+        filters: Optional[Dict],
+        exact_total: bool
+    ) -> Optional[Dict]:
+        """Keyset page in the same shape as CatalogService._load_page_by_cursor."""
+        snapshot = self._snapshot(city_id, category)
+        ids = self._index(snapshot, category, filters) if snapshot else None
+        if ids is None:
+            return None
+        
+        backward = False
+        if cursor:
+            backward, priority_level, created_at, listing_id = decode_cursor(cursor)
+            created_us = (created_at - _EPOCH) // _MICROSECOND
+            seek_key = (-priority_level, -created_us, -listing_id)
+        
+        if backward:
+            end = bisect.bisect_left(ids, seek_key, key=snapshot.key_of)
+            start = max(end - per_page, 0)
+            has_more = start > 0
+        else:
+            start = bisect.bisect_right(ids, seek_key, key=snapshot.key_of) if cursor else 0
+            end = start + per_page
+            has_more = len(ids) > end
+        listings = [snapshot.rows[listing_id] for listing_id in ids[start:end]]
+        
+        next_cursor = None
+        prev_cursor = None
+        if listings:
+            first, last = listings[0], listings[-1]
+            if has_more or backward:
+                next_cursor = encode_cursor(last.priority_level, last.created_at, last.id)
+            if (has_more and backward) or (cursor and not backward):
+                prev_cursor = encode_cursor(first.priority_level, first.created_at, first.id, backward=True)
+        
+        return {
+            'items': [self.to_item(row) for row in listings],
+            'total_count': len(ids) if exact_total else None,
+            'next_cursor': next_cursor,
+            'prev_cursor': prev_cursor
+        }
+    
+    def listing(self, listing_id: int) -> Optional[Dict]:
+        """Listing card in the same shape as CatalogService._load_listing (visible listings only)."""
+        city_id = self._listing_city.get(listing_id)
+        snapshot = self._cities.get(city_id) if city_id is not None else None
+        if snapshot is None or listing_id not in snapshot.rows:
+            return None
+        
+        row = snapshot.rows[listing_id]
+        if "*" in snapshot.stale or row.category in snapshot.stale:
+            return None
+        
+        item = self.to_item(row)
+        item.update({
+            'moderation_status': 'approved',
+            'is_hidden': False,
+            'city': snapshot.city_name
+        })
+        return item
+    
+    def _visible_query(self):
+        """Catalog columns of approved, visible listings."""
+        return select(*CATALOG_COLUMNS, Listing.city_id.label('listing_city_id')).where(and_(
+            Listing.moderation_status == literal_column("'approved'"),
+            Listing.is_hidden == False
+        ))
+    
+    async def load_city(self, db: AsyncSession, city_id: int, category: Optional[str] = None) -> int:
+        """
+        Load all approved, visible listings of city (or reload one category).
+        Returns number of rows loaded.
+        """
+        snapshot = self._cities.get(city_id)
+        if snapshot is None:
+            # A category reload needs the rest of the city too
+            category = None
+            city_name = await db.scalar(select(City.name_ru).where(City.id == city_id))
+            snapshot = CitySnapshot(city_id, city_name)
+        
+        # Read generations first: a change racing the query then only causes an extra reload
+        generations = {}
+        if self.generations is not None:
+            for name in [category] if category else [c.value for c in Category]:
+                generations[name] = tuple(await self.generations(city_id, name))
+        
+        query = self._visible_query().where(Listing.city_id == city_id)
+        if category is not None:
+            query = query.where(Listing.category == category)
+        
+        result = await db.execute(query)
+        rows = [SnapshotRow(row, city_id) for row in result.all()]
+        self._install(snapshot, category, rows)
+        snapshot.generations.update(generations)
+        
+        logger.info(f"Catalog snapshot for city {city_id} {category or 'all'} loaded: {len(rows)} listings")
+        return len(rows)
+    
+    def _install(self, snapshot: CitySnapshot, category: Optional[str], rows: List[SnapshotRow]):
+        """Put freshly loaded rows of city (or category) in place and mark them current."""
+        city_id = snapshot.city_id
+        if category is None:
+            for listing_id in snapshot.rows:
+                self._listing_city.pop(listing_id, None)
+        else:
+            for row in snapshot.rows.values():
+                if row.category == category:
+                    self._listing_city.pop(row.id, None)
+        snapshot.replace_category(category, rows)
+        for row in rows:
+            self._listing_city[row.id] = city_id
+        
+        if category is None:
+            snapshot.stale.clear()
+            snapshot.loaded_at = time.monotonic()
+        else:
+            snapshot.stale.discard(category)
+        self._cities[city_id] = snapshot
+    
+    async def refresh_listings(self, db: AsyncSession, listing_ids: List[int]):
+        """Re-read listings with one query and insert, move or drop each in its city snapshot."""
+        result = await db.execute(self._visible_query().where(
+            Listing.id == any_(bindparam('ids', list(listing_ids), type_=ARRAY(Integer)))
+        ))
+        rows = {row.id: row for row in result.all()}
+        
+        for listing_id in listing_ids:
+            old_city_id = self._listing_city.pop(listing_id, None)
+            if old_city_id is not None and old_city_id in self._cities:
+                self._cities[old_city_id].remove(listing_id)
+            
+            row = rows.get(listing_id)
+            snapshot = self._cities.get(row.listing_city_id) if row is not None else None
+            if snapshot is None:
+                # Hidden or deleted, or city not loaded (it reads fresh data when first requested)
+                continue
+            snapshot.upsert(SnapshotRow(row, row.listing_city_id))
+            self._listing_city[listing_id] = row.listing_city_id
+    
+    def invalidate(self, city_id: int, category: Optional[str] = None):
+        """Stop serving city (or category) from memory until it is reloaded."""
+        snapshot = self._cities.get(city_id)
+        if snapshot is None:
+            return
+        
+        snapshot.stale.add(category or "*")
+        self.schedule_load(city_id, category)
+    
+    def schedule_load(self, city_id: int, category: Optional[str] = None):
+        """Load city (or category) in the background unless a load is running."""
+        task = self._loading.get(city_id)
+        if task is not None and not task.done():
+            # The running load may have read pre-change rows; repeat it afterwards
+            self._reload.setdefault(city_id, set()).add(category)
+            return
+        
+        self._loading[city_id] = asyncio.create_task(self._run_load(city_id, category))
+    
+    async def _run_load(self, city_id: int, category: Optional[str]):
+        """Background load with its own session, repeated while invalidations arrive."""
+        from app.db.database import AsyncSessionLocal
+        try:
+            while True:
+                async with AsyncSessionLocal() as db:
+                    await self.load_city(db, city_id, category)
+                
+                pending = self._reload.pop(city_id, None)
+                if not pending:
+                    break
+                category = next(iter(pending)) if len(pending) == 1 else None
+        except Exception as e:
+            logger.error(f"Catalog snapshot load error for city {city_id}: {e}")
+        finally:
+            self._loading.pop(city_id, None)
+    
+    def serialize(self) -> bytes:
+        """Encode all fully loaded cities into the snapshot file layout."""
+        blocks = []
+        directory = {}
+        offset = 0
+        for city_id, snapshot in self._cities.items():
+            if snapshot.stale:
+                continue
+            block = _encode_city(snapshot)
+            directory[str(city_id)] = {
+                'offset': offset,
+                'length': len(block),
+                'generations': {name: list(value) for name, value in snapshot.generations.items()}
+            }
+            blocks.append(block)
+            offset += len(block)
+        
+        header = json.dumps({'cities': directory}).encode()
+        return _FILE_HEADER.pack(SNAPSHOT_FILE_MAGIC, SNAPSHOT_FILE_VERSION, time.time(), len(header)) + header + b"".join(blocks)
+    
+    def load_file(self, path: str) -> Dict[int, Dict[str, Tuple[int, int]]]:
+        """
+        Install cities from a snapshot file written by serialize().
+        Returns {city_id: generations recorded at write time} for the caller
+        to catch up on; empty when the file is missing or unreadable.
+        """
+        try:
+            # The map stays open while views into it are in use (closed on garbage collection);
+            # a rewritten file is a new inode, so existing maps are never affected
+            with open(path, "rb") as file:
+                mapped = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+            magic, version, written_at, header_length = _FILE_HEADER.unpack_from(mapped, 0)
+            if magic != SNAPSHOT_FILE_MAGIC or version != SNAPSHOT_FILE_VERSION:
+                logger.warning(f"Ignoring catalog snapshot file {path}: unknown format")
+                return {}
+            
+            start = _FILE_HEADER.size + header_length
+            directory = json.loads(mapped[_FILE_HEADER.size:start])['cities']
+            view = memoryview(mapped)
+            decoded = {}
+            for city_key, entry in directory.items():
+                city_id = int(city_key)
+                if city_id in self._cities or city_id not in self._known:
+                    continue
+                offset = start + entry['offset']
+                snapshot = _decode_city(city_id, view[offset:offset + entry['length']])
+                snapshot.generations = {name: tuple(value) for name, value in entry['generations'].items()}
+                decoded[city_id] = snapshot
+        except FileNotFoundError:
+            return {}
+        except (OSError, ValueError, KeyError, struct.error) as e:
+            logger.warning(f"Ignoring catalog snapshot file {path}: {e}")
+            return {}
+        
+        # Install only once the whole file decoded, so a bad block leaves nothing half-loaded
+        loaded = {}
+        for city_id, snapshot in decoded.items():
+            self._cities[city_id] = snapshot
+            for listing_id in snapshot.rows:
+                self._listing_city[listing_id] = city_id
+            loaded[city_id] = snapshot.generations
+        
+        logger.info(f"Catalog snapshot file {path} loaded: {len(loaded)} cities, written {time.time() - written_at:.0f}s ago")
+        return loaded
+
+def write_snapshot_file(path: str, data: bytes):
+    """Atomically replace snapshot file (readers never see a partial file)."""
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "wb") as file:
+        file.write(data)
+    os.replace(tmp_path, path)
+
+def _int_array(values) -> bytes:
+    """Little-endian int64 array bytes."""
+    column = array("q", values)
+    if sys.byteorder != "little":
+        column.byteswap()
+    return column.tobytes()
+
+def _encode_city(snapshot: CitySnapshot) -> bytes:
+    """Encode one city snapshot as a file block."""
+    rows = sorted(snapshot.rows.values(), key=lambda row: row.sort_key)
+    columns = []
+    for field in _INT_FIELDS:
+        values = (getattr(row, field) for row in rows)
+        if field == "created_at":
+            values = (None if value is None else (value - _EPOCH) // _MICROSECOND for value in values)
+        columns.append(_int_array(_NULL_INT if value is None else value for value in values))
+    
+    texts = [
+        json.dumps([getattr(row, field) for field in _TEXT_FIELDS], ensure_ascii=False).encode()
+        for row in rows
+    ]
+    offsets = [0]
+    for text in texts:
+        offsets.append(offsets[-1] + len(text))
+    columns.append(_int_array(offsets))
+    
+    indexes = sorted(snapshot.indexes.items(), key=lambda item: (item[0][0], item[0][1] or ""))
+    columns.extend(_int_array(ids) for _, ids in indexes)
+    meta = json.dumps({
+        'city_name': snapshot.city_name,
+        'indexes': [[category, sub_slug, len(ids)] for (category, sub_slug), ids in indexes]
+    }, ensure_ascii=False).encode()
+    
+    return _BLOCK_HEADER.pack(len(rows), len(meta), offsets[-1]) + meta + b"".join(columns) + b"".join(texts)
+
+def _int_view(block: memoryview, position: int, count: int) -> Sequence[int]:
+    """int64 array stored at position: a view into the map, or a copy on big-endian hosts."""
+    raw = block[position:position + count * 8]
+    if len(raw) != count * 8:
+        raise ValueError("truncated snapshot block")
+    if sys.byteorder == "little":
+        return raw.cast("q")
+    column = array("q")
+    column.frombytes(raw)
+    column.byteswap()
+    return column
+
+def _decode_city(city_id: int, block: memoryview) -> CitySnapshot:
+    """Map file block produced by _encode_city; rows are decoded on first access."""
+    count, meta_length, text_length = _BLOCK_HEADER.unpack_from(block, 0)
+    position = _BLOCK_HEADER.size
+    meta = json.loads(bytes(block[position:position + meta_length]))
+    position += meta_length
+    
+    columns: Dict[str, Sequence[int]] = {}
+    for field in _INT_FIELDS:
+        columns[field] = _int_view(block, position, count)
+        position += count * 8
+    offsets = _int_view(block, position, count + 1)
+    position += (count + 1) * 8
+    
+    snapshot = CitySnapshot(city_id, meta['city_name'])
+    for category, sub_slug, length in meta['indexes']:
+        snapshot.indexes[(category, sub_slug)] = _int_view(block, position, length)
+        position += length * 8
+    
+    if position + text_length > len(block):
+        raise ValueError("truncated snapshot block")
+    snapshot.rows = FileRows(city_id, columns, offsets, block[position:position + text_length])
+    return snapshot
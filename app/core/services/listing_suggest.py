@@ -0,0 +1,269 @@
+"""
+In-memory listing name autocomplete index for Karma System.
+"""
+import asyncio
+import bisect
+import logging
+import re
+import time
+import unicodedata
+from typing import Dict, List, Optional, Set, Tuple
+
+from sqlalchemy import select, and_, literal_column, any_, bindparam, Integer
+from sqlalchemy.dialects.postgresql import ARRAY
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.db.models import Listing
+
+logger = logging.getLogger(__name__)
+
+# Match kinds, best first: name starts with query, a later name word does, district does
+MATCH_NAME = 0
+MATCH_NAME_WORD = 1
+MATCH_DISTRICT = 2
+
+# Words of a name indexed as separate suffixes (longer names match on their start)
+SUGGEST_MAX_WORDS = 8
+
+# Index entries examined per lookup; bounds the cost of one-letter queries
+SUGGEST_SCAN_LIMIT = 500
+
+_WORD_RE = re.compile(r"\w+")
+
+def fold_text(text: Optional[str]) -> str:
+    """
+    Lowercase, strip diacritics and punctuation: "Phở Hòa, Đà Lạt" -> "pho hoa da lat".
+    Vietnamese đ has no decomposition and is mapped to d explicitly.
+    """
+    if not text:
+        return ""
+    text = unicodedata.normalize("NFD", text.replace("đ", "d").replace("Đ", "D"))
+    text = "".join(char for char in text if not unicodedata.combining(char)).casefold()
+    return " ".join(_WORD_RE.findall(text))
+
+class SuggestEntry:
+    """Listing fields returned by suggestions."""
+    
+    __slots__ = ("id", "name", "district", "category", "priority_level", "city_id")
+    
+    def __init__(self, row):
+        self.id = row.id
+        self.name = row.name
+        self.district = row.district
+        self.category = row.category
+        self.priority_level = row.priority_level or 0
+        self.city_id = row.city_id
+    
+    def terms(self) -> List[Tuple[str, int, int]]:
+        """Index entries (folded text, listing id, match kind) of this listing."""
+        terms = []
+        words = fold_text(self.name).split()[:SUGGEST_MAX_WORDS]
+        for position in range(len(words)):
+            kind = MATCH_NAME if position == 0 else MATCH_NAME_WORD
+            terms.append((" ".join(words[position:]), self.id, kind))
+        district = fold_text(self.district)
+        if district:
+            terms.append((district, self.id, MATCH_DISTRICT))
+        return terms
+    
+    def to_dict(self) -> Dict:
+        """Suggestion item returned by the API."""
+        return {
+            'id': self.id,
+            'name': self.name,
+            'district': self.district,
+            'category': self.category
+        }
+
+class CitySuggestions:
+    """Sorted (folded term, listing id, match kind) entries of one city."""
+    
+    __slots__ = ("terms", "listings", "loaded_at")
+    
+    def __init__(self, listings: List[SuggestEntry]):
+        self.listings: Dict[int, SuggestEntry] = {listing.id: listing for listing in listings}
+        self.terms: List[Tuple[str, int, int]] = sorted(
+            term for listing in listings for term in listing.terms()
+        )
+        self.loaded_at = time.monotonic()
+    
+    def remove(self, listing_id: int):
+        """Drop one listing and its entries."""
+        listing = self.listings.pop(listing_id, None)
+        if listing is None:
+            return
+        for term in listing.terms():
+            position = bisect.bisect_left(self.terms, term)
+            if position < len(self.terms) and self.terms[position] == term:
+                del self.terms[position]
+    
+    def upsert(self, listing: SuggestEntry):
+        """Insert listing (or replace it after a rename) keeping entries sorted."""
+        self.remove(listing.id)
+        self.listings[listing.id] = listing
+        for term in listing.terms():
+            bisect.insort(self.terms, term)
+    
+    def lookup(self, prefix: str, limit: int) -> List[SuggestEntry]:
+        """Listings with a term starting with prefix: name matches first, then by priority and name."""
+        best: Dict[int, int] = {}
+        position = bisect.bisect_left(self.terms, (prefix,))
+        end = min(position + SUGGEST_SCAN_LIMIT, len(self.terms))
+        while position < end:
+            term, listing_id, kind = self.terms[position]
+            if not term.startswith(prefix):
+                break
+            if kind < best.get(listing_id, MATCH_DISTRICT + 1):
+                best[listing_id] = kind
+            position += 1
+        
+        matches = [self.listings[listing_id] for listing_id in best]
+        matches.sort(key=lambda listing: (best[listing.id], -listing.priority_level, listing.name))
+        return matches[:limit]
+
+class ListingSuggestIndex:
+    """
+    Per-city prefix index over names and districts of approved, visible listings.
+    
+    A city is loaded on its first lookup; afterwards changed listings are
+    applied row by row, invalidated cities and cities older than max_age are
+    rebuilt in the background while the current index keeps answering.
+    Only cities passed to set_cities (the active ones) are ever loaded.
+    """
+    
+    def __init__(self, max_age: float = 300.0):
+        self.max_age = max_age
+        self._cities: Dict[int, CitySuggestions] = {}
+        self._listing_city: Dict[int, int] = {}
+        self._loading: Dict[int, asyncio.Task] = {}
+        # Cities invalidated while a load was running, rebuilt right after it
+        self._reload: Set[int] = set()
+        # Active cities (set_cities), and load time of those found without listings
+        self._known: Set[int] = set()
+        self._empty: Dict[int, float] = {}
+    
+    def set_cities(self, city_ids: List[int]):
+        """Replace the set of active cities, dropping indexes of cities no longer in it."""
+        self._known = set(city_ids)
+        for city_id in [city_id for city_id in self._cities if city_id not in self._known]:
+            self._drop(city_id)
+        for city_id in [city_id for city_id in self._empty if city_id not in self._known]:
+            del self._empty[city_id]
+    
+    def _drop(self, city_id: int):
+        """Forget city index and its listing ids."""
+        old = self._cities.pop(city_id, None)
+        if old is not None:
+            for listing_id in old.listings:
+                self._listing_city.pop(listing_id, None)
+    
+    def _query(self):
+        """Indexed columns of approved, visible listings."""
+        return select(
+            Listing.id,
+            Listing.name,
+            Listing.district,
+            Listing.category,
+            Listing.priority_level,
+            Listing.city_id
+        ).where(and_(
+            Listing.moderation_status == literal_column("'approved'"),
+            Listing.is_hidden == False
+        ))
+    
+    async def suggest(self, city_id: int, query: str, limit: int = 10) -> List[Dict]:
+        """Suggestions for query typed so far; waits for the city index on first use."""
+        prefix = fold_text(query)
+        if not prefix or city_id not in self._known:
+            return []
+        
+        city = self._cities.get(city_id)
+        if city is None:
+            empty_at = self._empty.get(city_id)
+            if empty_at is not None and time.monotonic() - empty_at <= self.max_age:
+                return []
+            # Join a running load instead of scheduling a repeat of it
+            await asyncio.shield(self._loading.get(city_id) or self.schedule_load(city_id))
+            city = self._cities.get(city_id)
+            if city is None:
+                return []
+        elif time.monotonic() - city.loaded_at > self.max_age:
+            self.schedule_load(city_id)
+        
+        return [listing.to_dict() for listing in city.lookup(prefix, limit)]
+    
+    async def load_city(self, db: AsyncSession, city_id: int) -> int:
+        """Build index of city from the DB. Returns number of listings indexed."""
+        result = await db.execute(self._query().where(Listing.city_id == city_id))
+        listings = [SuggestEntry(row) for row in result.all()]
+        
+        self._drop(city_id)
+        if not listings:
+            # Nothing to index; remembered so lookups do not reload it before max_age
+            self._empty[city_id] = time.monotonic()
+            logger.info(f"Suggest index for city {city_id} loaded: no listings")
+            return 0
+        
+        self._empty.pop(city_id, None)
+        self._cities[city_id] = CitySuggestions(listings)
+        for listing in listings:
+            self._listing_city[listing.id] = city_id
+        
+        logger.info(f"Suggest index for city {city_id} loaded: {len(listings)} listings")
+        return len(listings)
+    
+    async def refresh_listings(self, db: AsyncSession, listing_ids: List[int]):
+        """Re-read listings with one query and insert, update or drop each in its city index."""
+        result = await db.execute(self._query().where(
+            Listing.id == any_(bindparam('ids', list(listing_ids), type_=ARRAY(Integer)))
+        ))
+        rows = {row.id: row for row in result.all()}
+        
+        for listing_id in listing_ids:
+            old_city_id = self._listing_city.pop(listing_id, None)
+            if old_city_id is not None and old_city_id in self._cities:
+                self._cities[old_city_id].remove(listing_id)
+            
+            row = rows.get(listing_id)
+            if row is not None:
+                # An empty city gains its first listing: load it on the next lookup
+                self._empty.pop(row.city_id, None)
+            if row is None or row.city_id not in self._cities:
+                # Hidden or deleted, or city not loaded (it reads fresh data on first lookup)
+                continue
+            self._cities[row.city_id].upsert(SuggestEntry(row))
+            self._listing_city[listing_id] = row.city_id
+    
+    def invalidate(self, city_id: int):
+        """Rebuild loaded city in the background; lookups keep using the current index."""
+        self._empty.pop(city_id, None)
+        if city_id in self._cities:
+            self.schedule_load(city_id)
+    
+    def schedule_load(self, city_id: int) -> asyncio.Task:
+        """Load city in the background unless a load is running; returns the load task."""
+        task = self._loading.get(city_id)
+        if task is not None and not task.done():
+            # The running load may have read pre-change rows; repeat it afterwards
+            self._reload.add(city_id)
+            return task
+        
+        task = asyncio.create_task(self._run_load(city_id))
+        self._loading[city_id] = task
+        return task
+    
+    async def _run_load(self, city_id: int):
+        """Background load with its own session, repeated while invalidations arrive."""
+        from app.db.database import AsyncSessionLocal
+        try:
+            while True:
+                async with AsyncSessionLocal() as db:
+                    await self.load_city(db, city_id)
+                
+                if city_id not in self._reload:
+                    break
+                self._reload.discard(city_id)
+        except Exception as e:
+            logger.error(f"Suggest index load error for city {city_id}: {e}")
+        finally:
+            self._loading.pop(city_id, None)
@@ -2,17 +2,19 @@
 Partners service for Karma System.
 """
 import hashlib
+import logging
 import os
 from typing import Dict, List, Optional
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select, update
-from sqlalchemy.orm import selectinload
 
 from app.db.models import (
     User, PartnerProfile, PartnerAuth, PartnerApplication, 
-    Listing, UserRole, PartnerStatus
+    Listing, City, UserRole, PartnerStatus
 )
 
+logger = logging.getLogger(__name__)
+
 class PartnersService:
     """Service for partner operations."""
     
@@ -153,15 +155,18 @@ class PartnersService:
             
             await db.commit()
             
-            # Invalidate cache
-            from app.core.services.catalog_service import catalog_service
-            await catalog_service.invalidate_cache(application.city_id)
-            
-            return True
-            
         except Exception:
             await db.rollback()
             return False
+        
+        # Approval is committed; a cache failure must not report it as failed
+        from app.core.services.catalog_service import catalog_service
+        try:
+            await catalog_service.invalidate_cache(application.city_id, application.category, [listing.id])
+        except Exception as e:
+            logger.error(f"Catalog invalidation after approving application {application_id} failed: {e}")
+        
+        return True
     
     async def reject_application(
         self,
@@ -197,26 +202,33 @@ class PartnersService:
     ) -> List[Dict]:
         """Get partner's listings."""
         query = (
-            select(Listing)
+            select(
+                Listing.id,
+                Listing.name,
+                Listing.category,
+                Listing.moderation_status,
+                Listing.is_hidden,
+                Listing.created_at,
+                City.name_ru.label("city_name")
+            )
+            .outerjoin(City, City.id == Listing.city_id)
             .where(Listing.user_id == user_id)
-            .options(selectinload(Listing.city))
             .order_by(Listing.created_at.desc())
         )
         
         result = await db.execute(query)
-        listings = result.scalars().all()
         
         return [
             {
-                "id": listing.id,
-                "name": listing.name,
-                "category": listing.category,
-                "moderation_status": listing.moderation_status,
-                "is_hidden": listing.is_hidden,
-                "city": listing.city.name if listing.city else None,
-                "created_at": listing.created_at
+                "id": row.id,
+                "name": row.name,
+                "category": row.category,
+                "moderation_status": row.moderation_status,
+                "is_hidden": row.is_hidden,
+                "city": row.city_name,
+                "created_at": row.created_at
             }
-            for listing in listings
+            for row in result
         ]
     
     def _hash_phone(self, phone: str) -> str:
@@ -6,11 +6,11 @@ from enum import Enum
 from typing import Optional, List
 from sqlalchemy import (
     Column, Integer, String, DateTime, Boolean, Text, 
-    ForeignKey, Numeric, Index, UniqueConstraint, func, JSON
+    ForeignKey, Numeric, Index, UniqueConstraint, func, JSON, text
 )
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import relationship
-from sqlalchemy.dialects.postgresql import UUID, JSONB
+from sqlalchemy.orm import relationship, deferred
+from sqlalchemy.dialects.postgresql import UUID, JSONB, TSVECTOR
 from geoalchemy2 import Geography
 import uuid
 
@@ -160,6 +160,8 @@ class Listing(Base):
     longitude = Column(Numeric(11, 8))
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    # Maintained by trigger from name/description/address/district (see migration 0004)
+    search_vector = deferred(Column(TSVECTOR))
     
     # Relationships
     city = relationship("City", back_populates="listings")
@@ -172,6 +174,33 @@ class Listing(Base):
         Index('idx_listings_city_category_status', 'city_id', 'category', 'moderation_status'),
         Index('idx_listings_priority', 'priority_level', postgresql_using='btree', postgresql_ops={'priority_level': 'DESC'}),
         Index('idx_listings_user', 'user_id'),
+        # Partial covering indexes for catalog pages on NULL-safe sort expressions (see migrations 0002, 0005)
+        Index(
+            'idx_listings_catalog', 'city_id', 'category',
+            func.coalesce(priority_level, text("0")).desc(),
+            func.coalesce(created_at, text("'1970-01-01 00:00:00'::timestamp")).desc(),
+            id.desc(),
+            postgresql_where=text("moderation_status = 'approved' AND NOT is_hidden")
+        ),
+        Index(
+            'idx_listings_catalog_sub', 'city_id', 'category', 'sub_slug',
+            func.coalesce(priority_level, text("0")).desc(),
+            func.coalesce(created_at, text("'1970-01-01 00:00:00'::timestamp")).desc(),
+            id.desc(),
+            postgresql_where=text("moderation_status = 'approved' AND NOT is_hidden")
+        ),
+        # Search indexes (see migration 0004)
+        Index(
+            'idx_listings_search', 'search_vector',
+            postgresql_using='gin',
+            postgresql_where=text("moderation_status = 'approved' AND NOT is_hidden")
+        ),
+        Index(
+            'idx_listings_name_trgm', 'name',
+            postgresql_using='gin',
+            postgresql_ops={'name': 'gin_trgm_ops'},
+            postgresql_where=text("moderation_status = 'approved' AND NOT is_hidden")
+        ),
     )
 
 class QRIssue(Base):
@@ -12,23 +12,39 @@ from fastapi import FastAPI
 
 # Import bot and API components
 from app.bot.main import main as bot_main
-from app.api.main import app as api_app
+from app.api.main import app as api_app, metrics
+from app.core.cache_subscriber import start_invalidation_subscriber, stop_invalidation_subscriber
+from app.core.db_listener import start_change_listener, stop_change_listener
+from app.core.redis_pool import close_redis_pool
+from app.core.services.catalog_service import catalog_service
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     """Manage application startup and shutdown."""
+    # Drop in-process cache entries when other processes invalidate
+    subscriber_task = start_invalidation_subscriber()
+    # Turn direct DB edits into cache invalidations
+    listener_task = start_change_listener()
+    
+    # Precompute first catalog pages without blocking startup
+    warmup_task = asyncio.create_task(catalog_service.warm_up())
+    
     # Start bot in background task
     bot_task = asyncio.create_task(bot_main())
     
     yield
     
     # Cleanup on shutdown
-    bot_task.cancel()
-    try:
-        await bot_task
-    except asyncio.CancelledError:
-        pass
+    await stop_invalidation_subscriber(subscriber_task)
+    await stop_change_listener(listener_task)
+    for task in (warmup_task, bot_task):
+        task.cancel()
+        try:
+            await task
+        except asyncio.CancelledError:
+            pass
+    await close_redis_pool()
 
 
 # Create main FastAPI app
@@ -48,6 +64,9 @@ async def health_check():
     """Health check endpoint for Railway."""
     return {"status": "healthy", "service": "karma-system"}
 
+# Prometheus scrapes the root path; also served as /api/metrics
+app.add_api_route("/metrics", metrics, include_in_schema=False)
+
 
 if __name__ == "__main__":
     port = int(os.getenv("PORT", 8000))
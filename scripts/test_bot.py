@@ -15,8 +15,10 @@ sys.path.append(str(Path(__file__).parent.parent))
 from app.db.database import get_db, init_db
 from app.core.services.qr_service import qr_service
 from app.core.services.partners_service import partners_service
-from app.core.services.catalog_service import catalog_service
+from app.core.services.catalog_service import catalog_service, encode_cursor
 from app.core.cache import cache_service
+from sqlalchemy import text
+from sqlalchemy.dialects import postgresql
 
 class BotTester:
     def __init__(self):
@@ -118,6 +120,53 @@ class BotTester:
         except Exception as e:
             self.log_test("Catalog Service", "FAIL", str(e))
     
+    async def test_catalog_index_usage(self):
+        """Test catalog page queries (offset and keyset) use the partial index without a Sort node"""
+        created_at = datetime(2025, 1, 1)
+        forward = encode_cursor(1, created_at, 100)
+        backward = encode_cursor(1, created_at, 100, backward=True)
+        cases = [
+            ("offset", "restaurants", None, None),
+            ("offset", "restaurants", {"sub_slug": "asia"}, None),
+            ("offset", "spa", None, None),
+            ("first page", "restaurants", None, None),
+            ("forward", "restaurants", None, forward),
+            ("backward", "restaurants", None, backward),
+            ("forward", "restaurants", {"sub_slug": "asia"}, forward),
+            ("backward", "restaurants", {"sub_slug": "asia"}, backward),
+            ("forward", "spa", None, forward),
+        ]
+        try:
+            async for db in get_db():
+                # Tiny test tables would otherwise always be seq-scanned
+                await db.execute(text("SET enable_seqscan = off"))
+                problems = []
+                for kind, category, filters, cursor in cases:
+                    if kind == "offset":
+                        query = catalog_service.build_page_query(1, category, page=3, per_page=5, filters=filters)
+                    else:
+                        query = catalog_service.build_cursor_query(1, category, cursor, per_page=5, filters=filters, pages=3)
+                    sql = str(query.compile(
+                        dialect=postgresql.dialect(),
+                        compile_kwargs={"literal_binds": True}
+                    ))
+                    result = await db.execute(text("EXPLAIN " + sql))
+                    plan = "\n".join(row[0] for row in result)
+                    if "idx_listings_catalog" not in plan:
+                        problems.append(f"{kind} {category}/{filters}: index not used")
+                    # Matches both "Sort" and "Incremental Sort" nodes
+                    if "Sort" in plan:
+                        problems.append(f"{kind} {category}/{filters}: Sort node present")
+                await db.execute(text("RESET enable_seqscan"))
+                
+                if problems:
+                    self.log_test("Catalog Index Usage", "FAIL", "; ".join(problems))
+                else:
+                    self.log_test("Catalog Index Usage", "PASS")
+                break
+        except Exception as e:
+            self.log_test("Catalog Index Usage", "FAIL", str(e))
+    
     def test_environment_variables(self):
         """Test required environment variables"""
         required_vars = [
@@ -166,6 +215,7 @@ class BotTester:
         await self.test_qr_service()
         await self.test_partner_service()
         await self.test_catalog_service()
+        await self.test_catalog_index_usage()
         
         # Summary
         print("\n" + "=" * 50)